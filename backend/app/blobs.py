@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .text_index import CHUNK_SIZE
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+STALE_UPLOAD_SECONDS = 24 * 3600
+
+
+class BlobError(ValueError):
+    pass
+
+
+def is_blob_id(value: str) -> bool:
+    return bool(_SHA256.match(value))
+
+
+def _merge(ranges: list[list[int]], start: int, end: int) -> list[list[int]]:
+    merged: list[list[int]] = []
+    for item in sorted([*ranges, [start, end]]):
+        if merged and item[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], item[1])
+        else:
+            merged.append(list(item))
+    return merged
+
+
+@dataclass
+class UploadState:
+    sha256: str
+    size: int
+    mime: Optional[str] = None
+    received: list[list[int]] = field(default_factory=list)
+
+    def missing(self) -> list[list[int]]:
+        gaps = []
+        position = 0
+        for start, end in self.received:
+            if start > position:
+                gaps.append([position, start])
+            position = max(position, end)
+        if position < self.size:
+            gaps.append([position, self.size])
+        return gaps
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing()
+
+
+class BlobStore:
+    """
+    Content-addressed blobs on disk, keyed by sha256. Uploads are written in
+    chunks straight into a part file; the received byte ranges are persisted
+    next to it, so an interrupted upload resumes with only the missing ranges.
+    All methods do blocking file I/O and are meant for worker threads.
+    Writes to a part file and its completion share a per-upload lock, so no
+    chunk lands after the hash has been checked. Blobs are kept only for ttl
+    seconds after their last use, and within max_bytes in total.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, ttl: int = 0) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.blob_dir = root / "blobs"
+        self.upload_dir = root / "uploads"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._upload_locks: dict[str, threading.Lock] = {}
+
+    @classmethod
+    def from_config(
+        cls, blob_dir: Optional[str], max_bytes: int, ttl: int = 0
+    ) -> "BlobStore":
+        root = Path(blob_dir) if blob_dir else Path(tempfile.gettempdir()) / "tiny-craft"
+        return cls(root, max_bytes, ttl)
+
+    def path(self, blob_id: str) -> Path:
+        if not is_blob_id(blob_id):
+            raise BlobError(f"Invalid blob id: {blob_id}")
+        return self.blob_dir / blob_id
+
+    def info(self, blob_id: str) -> Optional[dict]:
+        path = self.path(blob_id)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if self.ttl > 0 and stat.st_mtime < time.time() - self.ttl:
+            # Expired but not pruned yet; callers should upload it again.
+            return None
+        meta = self._read_json(path.with_suffix(".json")) or {}
+        return {"id": blob_id, "size": stat.st_size, "mime": meta.get("mime")}
+
+    def read(self, blob_id: str) -> bytes:
+        path = self.path(blob_id)
+        if not path.exists():
+            raise BlobError(f"Blob not found: {blob_id}")
+        os.utime(path)
+        return path.read_bytes()
+
+    def open(self, blob_id: str):
+        path = self.path(blob_id)
+        if not path.exists():
+            raise BlobError(f"Blob not found: {blob_id}")
+        os.utime(path)
+        return path.open("rb")
+
+    def _read_json(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _upload_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def _part(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.part"
+
+    def _state_path(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.json"
+
+    def upload_state(self, upload_id: str) -> Optional[UploadState]:
+        if not is_blob_id(upload_id):
+            raise BlobError(f"Invalid upload id: {upload_id}")
+        data = self._read_json(self._state_path(upload_id))
+        return UploadState(**data) if data else None
+
+    def _save_state(self, state: UploadState) -> None:
+        path = self._state_path(state.sha256)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(state)), "utf-8")
+        tmp.replace(path)
+
+    def start_upload(self, sha256: str, size: int, mime: Optional[str]) -> UploadState:
+        """
+        The upload id is the expected hash, so a client restarting from
+        scratch resumes the same part file instead of starting over.
+        """
+        if not is_blob_id(sha256):
+            raise BlobError(f"Invalid sha256: {sha256}")
+        if size < 0:
+            raise BlobError("Size must be >= 0")
+        if self.max_bytes > 0 and size > self.max_bytes:
+            raise BlobError(f"Blob too large: {size} > {self.max_bytes} bytes")
+        self._prune_uploads()
+        with self._lock:
+            self._prune_blobs()
+        # The upload lock keeps a restart from truncating a part file that a
+        # concurrent complete() is hashing.
+        with self._upload_lock(sha256), self._lock:
+            state = self.upload_state(sha256)
+            if state is not None and state.size == size:
+                return state
+            state = UploadState(sha256=sha256, size=size, mime=mime)
+            with self._part(sha256).open("wb") as handle:
+                handle.truncate(size)
+            self._save_state(state)
+            return state
+
+    def write_at(self, upload_id: str, offset: int, data: bytes) -> None:
+        """Write bytes into the part file without recording them as received."""
+        state = self.upload_state(upload_id)
+        if state is None:
+            raise BlobError(f"Upload not found: {upload_id}")
+        if offset < 0 or offset + len(data) > state.size:
+            raise BlobError("Chunk exceeds the declared size")
+        with self._upload_lock(upload_id):
+            try:
+                with self._part(upload_id).open("r+b") as handle:
+                    handle.seek(offset)
+                    handle.write(data)
+            except FileNotFoundError:
+                raise BlobError(f"Upload not found: {upload_id}")
+
+    def record_range(self, upload_id: str, start: int, end: int) -> UploadState:
+        with self._lock:
+            # Re-read so ranges recorded by concurrent chunk writes are kept.
+            state = self.upload_state(upload_id)
+            if state is None:
+                raise BlobError(f"Upload not found: {upload_id}")
+            if end > start:
+                state.received = _merge(state.received, start, end)
+            self._save_state(state)
+            return state
+
+    def write_chunk(self, upload_id: str, offset: int, data: bytes) -> UploadState:
+        self.write_at(upload_id, offset, data)
+        return self.record_range(upload_id, offset, offset + len(data))
+
+    def complete(self, upload_id: str) -> dict:
+        """
+        The part file is hashed under its upload lock only; the store-wide
+        lock is held just for the rename and bookkeeping, so a large
+        completion does not stall other uploads.
+        """
+        with self._upload_lock(upload_id):
+            state = self.upload_state(upload_id)
+            if state is None:
+                if self.path(upload_id).exists():
+                    return self.info(upload_id)
+                raise BlobError(f"Upload not found: {upload_id}")
+            if not state.complete:
+                raise BlobError("Upload is missing chunks")
+            part = self._part(upload_id)
+            digest = hashlib.sha256()
+            with part.open("rb") as handle:
+                while True:
+                    chunk = handle.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+            with self._lock:
+                if digest.hexdigest() != state.sha256:
+                    state.received = []
+                    self._save_state(state)
+                    raise BlobError("Content hash mismatch; upload restarted")
+                target = self.blob_dir / state.sha256
+                part.replace(target)
+                if state.mime:
+                    target.with_suffix(".json").write_text(
+                        json.dumps({"mime": state.mime}), "utf-8"
+                    )
+                self._state_path(upload_id).unlink(missing_ok=True)
+                self._upload_locks.pop(upload_id, None)
+                self._prune_blobs(keep=state.sha256)
+            return self.info(state.sha256)
+
+    def _prune_uploads(self) -> None:
+        cutoff = time.time() - STALE_UPLOAD_SECONDS
+        for path in self.upload_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    self._part(path.stem).unlink(missing_ok=True)
+                    path.unlink(missing_ok=True)
+            except OSError:
+                continue
+
+    def _prune_blobs(self, keep: Optional[str] = None) -> None:
+        """
+        Drop blobs unused for longer than ttl, then evict the least recently
+        used ones while the store exceeds max_bytes. Reads touch the mtime.
+        """
+        if self.ttl <= 0 and self.max_bytes <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        entries = []
+        total = 0
+        for path in self.blob_dir.iterdir():
+            if not is_blob_id(path.name) or path.name == keep:
+                continue
+            try:
+                stat = path.stat()
+                if self.ttl > 0 and stat.st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    path.with_suffix(".json").unlink(missing_ok=True)
+                    continue
+            except OSError:
+                continue
+            total += stat.st_size
+            entries.append((stat.st_mtime, stat.st_size, path))
+        if self.max_bytes <= 0:
+            return
+        if keep is not None and self.path(keep).exists():
+            total += self.path(keep).stat().st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store(blob_dir: Optional[str], max_bytes: int, ttl: int = 0) -> BlobStore:
+    global _store
+    with _store_lock:
+        root = Path(blob_dir) if blob_dir else None
+        if _store is None or (root is not None and _store.root != root):
+            _store = BlobStore.from_config(blob_dir, max_bytes, ttl)
+        _store.max_bytes = max_bytes
+        _store.ttl = ttl
+        return _store
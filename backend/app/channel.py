@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from fastapi import WebSocket
+
+from .storage import TERMINAL_EVENTS, JobStore
+
+# Event types where only the latest value per job matters; a slow client gets
+# the newest one instead of the whole backlog.
+COALESCE_TYPES = frozenset({"progress", "tile", "circuit"})
+MAX_SUBSCRIPTIONS = 1000
+MAX_BACKLOG = 2000
+MAX_BATCH = 200
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=True, separators=(",", ":"))
+
+
+class JobChannel:
+    """
+    One WebSocket multiplexing events for many jobs. Clients send
+    {"op": "subscribe" | "unsubscribe", "ids": [...]} (or {"op": "ping"});
+    the server sends JSON arrays of events, each tagged with its "job" id.
+    Pending progress-like events are coalesced per job, and a client that
+    still falls MAX_BACKLOG events behind is disconnected.
+    """
+
+    def __init__(self, websocket: WebSocket, store: JobStore) -> None:
+        self.websocket = websocket
+        self.store = store
+        self.subscriptions: set[str] = set()
+        self._pending: OrderedDict[Hashable, dict] = OrderedDict()
+        self._counter = itertools.count()
+        self._ready = asyncio.Event()
+        self._overflow = False
+
+    def _enqueue(self, job_id: str, event: dict) -> None:
+        frame = {"job": job_id, **event}
+        kind = event.get("type")
+        if kind in COALESCE_TYPES:
+            key: Hashable = (job_id, kind)
+        else:
+            key = next(self._counter)
+        self._pending[key] = frame
+        if len(self._pending) > MAX_BACKLOG:
+            self._overflow = True
+        self._ready.set()
+
+    def _on_event(self, job_id: str, event: dict) -> None:
+        self._enqueue(job_id, event)
+        if event.get("type") in TERMINAL_EVENTS:
+            self._unsubscribe(job_id)
+
+    def _subscribe(self, job_id: str) -> None:
+        if job_id in self.subscriptions:
+            return
+        record = self.store.get(job_id)
+        if record is None:
+            self._enqueue(job_id, {"type": "error", "message": "Job not found"})
+            return
+        if len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+            self._enqueue(job_id, {"type": "error", "message": "Too many subscriptions"})
+            return
+        snapshot = record.snapshot(job_id)
+        snapshot.pop("id")
+        self._enqueue(job_id, {"type": "snapshot", **snapshot})
+        if record.final_event is not None:
+            self._enqueue(job_id, record.final_event)
+            return
+        self.subscriptions.add(job_id)
+        self.store.add_listener(job_id, self._on_event)
+
+    def _unsubscribe(self, job_id: str) -> None:
+        if job_id in self.subscriptions:
+            self.subscriptions.discard(job_id)
+            self.store.remove_listener(job_id, self._on_event)
+
+    async def _receive(self) -> None:
+        while True:
+            try:
+                message = await self.websocket.receive_json()
+            except ValueError:
+                self._enqueue("", {"type": "error", "message": "Invalid message"})
+                continue
+            if not isinstance(message, dict):
+                message = {}
+            op = message.get("op")
+            ids = message.get("ids") or []
+            if isinstance(ids, str):
+                ids = [ids]
+            if op == "subscribe":
+                for job_id in ids:
+                    self._subscribe(str(job_id))
+            elif op == "unsubscribe":
+                for job_id in ids:
+                    self._unsubscribe(str(job_id))
+            elif op == "ping":
+                self._enqueue("", {"type": "pong"})
+            else:
+                self._enqueue("", {"type": "error", "message": f"Unknown op: {op}"})
+
+    async def _send(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._pending:
+                if self._overflow:
+                    await self.websocket.close(code=1013, reason="Client too slow")
+                    return
+                batch = []
+                while self._pending and len(batch) < MAX_BATCH:
+                    batch.append(self._pending.popitem(last=False)[1])
+                await self.websocket.send_text(_dumps(batch))
+
+    async def serve(self) -> None:
+        await self.websocket.accept()
+        receiver = asyncio.create_task(self._receive())
+        sender = asyncio.create_task(self._send())
+        try:
+            await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (receiver, sender):
+                task.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+            for job_id in list(self.subscriptions):
+                self._unsubscribe(job_id)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# classify_error kinds that count as upstream failures. Auth and unknown
+# errors are the caller's problem and leave the breaker untouched.
+TRIP_KINDS = frozenset({"upstream_error", "network_unreachable"})
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures, rejects
+    calls for `reset_timeout` seconds, then lets a single probe call through
+    (half-open). The probe's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._changed = asyncio.Event()
+        self.last_kind: Optional[str] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def configure(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.retry_in() <= 0:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def retry_in(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning("Circuit breaker %s -> %s", self._state, state)
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def try_acquire(self) -> bool:
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    async def wait(self, timeout: float) -> bool:
+        """Park until a call is allowed; False if `timeout` runs out first."""
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            changed = self._changed
+            wake = min(remaining, self.retry_in() or remaining)
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=max(wake, 0.01))
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self._failures = 0
+        self._probe_in_flight = False
+        self._set_state(CLOSED)
+
+    def record_failure(self, kind: str) -> None:
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if kind not in TRIP_KINDS:
+            if was_probe:
+                self._changed.set()
+                self._changed = asyncio.Event()
+            return
+        self.failures += 1
+        self._failures += 1
+        self.last_kind = kind
+        if not self.enabled or self.state == OPEN:
+            return
+        if was_probe or self._failures >= self.failure_threshold:
+            self._set_state(OPEN)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_s": self.reset_timeout,
+            "retry_in_s": round(self.retry_in(), 1),
+            "last_kind": self.last_kind,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import os
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import yaml
 from dotenv import load_dotenv
@@ -16,6 +16,7 @@ CONFIG_PATH = ROOT_DIR / "backend" / "config" / "app.yaml"
 @dataclass
 class AppConfig:
     nano_banana_api_key: Optional[str] = None
+    nano_banana_api_keys: List[str] = field(default_factory=list)
     nano_banana_model: str = "gemini-3-pro-image-preview"
     nano_banana_base_url: Optional[str] = None
     nano_banana_timeout: int = 60
@@ -26,19 +27,119 @@ class AppConfig:
     nano_banana_enable_search: bool = False
     nano_banana_proxy: Optional[str] = None
     nano_banana_trust_env: bool = True
+    trace_export_url: Optional[str] = None
+    watchdog_enabled: bool = False
+    watchdog_interval_ms: int = 100
+    watchdog_threshold_ms: int = 250
+    tile_size: int = 0
+    tile_overlap: int = 128
+    tile_concurrency: int = 4
+    health_interval: int = 60
+    health_fail_fast: bool = True
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: int = 30
+    circuit_mode: str = "fail"
+    circuit_park_timeout: int = 300
+    nano_banana_pool: List[Dict[str, Any]] = field(default_factory=list)
+    pool_member_concurrency: int = 0
+    pool_member_rate_per_minute: int = 0
+    pool_rate_limit_cooldown: int = 30
+    pool_auth_cooldown: int = 600
+    pool_wait_timeout: int = 120
+    hedge_enabled: bool = False
+    hedge_percentile: int = 95
+    hedge_min_delay_ms: int = 5000
+    hedge_budget_percent: int = 10
+    hedge_other_member: bool = True
+    job_timeout: int = 0
+    job_ttl: int = 3600
+    blob_dir: Optional[str] = None
+    blob_chunk_size: int = 4 * 1024 * 1024
+    blob_max_bytes: int = 2 * 1024 * 1024 * 1024
+    blob_ttl: int = 3600
+    delta_enabled: bool = True
+    delta_threshold: int = 12
+    delta_cell: int = 32
+    webhook_secret: Optional[str] = None
+    webhook_allowed_hosts: List[str] = field(default_factory=list)
+    webhook_max_attempts: int = 5
+    webhook_backoff_ms: int = 500
+    webhook_batch_window_ms: int = 200
+    webhook_batch_size: int = 100
+    webhook_timeout: int = 10
 
     def public_dict(self) -> Dict[str, Any]:
         data = asdict(self)
         data.pop("nano_banana_api_key", None)
+        data.pop("nano_banana_api_keys", None)
+        data.pop("webhook_secret", None)
+        # Pool members reference keys through api_key_env only; an inline key
+        # must never be echoed by GET /api/config or written to app.yaml.
+        data["nano_banana_pool"] = [
+            {key: value for key, value in item.items() if key != "api_key"}
+            if isinstance(item, dict)
+            else item
+            for item in data["nano_banana_pool"]
+        ]
         return data
 
 
+_INT_KEYS = {
+    "nano_banana_timeout",
+    "nano_banana_max_images",
+    "watchdog_interval_ms",
+    "watchdog_threshold_ms",
+    "tile_size",
+    "tile_overlap",
+    "tile_concurrency",
+    "health_interval",
+    "circuit_failure_threshold",
+    "circuit_reset_timeout",
+    "circuit_park_timeout",
+    "pool_member_concurrency",
+    "pool_member_rate_per_minute",
+    "pool_rate_limit_cooldown",
+    "pool_auth_cooldown",
+    "pool_wait_timeout",
+    "hedge_percentile",
+    "hedge_min_delay_ms",
+    "hedge_budget_percent",
+    "job_timeout",
+    "job_ttl",
+    "blob_chunk_size",
+    "blob_max_bytes",
+    "blob_ttl",
+    "delta_threshold",
+    "delta_cell",
+    "webhook_max_attempts",
+    "webhook_backoff_ms",
+    "webhook_batch_window_ms",
+    "webhook_batch_size",
+    "webhook_timeout",
+}
+_BOOL_KEYS = {
+    "nano_banana_enable_search",
+    "nano_banana_trust_env",
+    "watchdog_enabled",
+    "health_fail_fast",
+    "hedge_enabled",
+    "hedge_other_member",
+    "delta_enabled",
+}
+
+
 def _coerce_bool(value: Optional[str]) -> Optional[bool]:
     if value is None:
         return None
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _split_keys(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 def _load_file_config() -> Dict[str, Any]:
     if not CONFIG_PATH.exists():
         return {}
@@ -50,6 +151,7 @@ def _load_env_config() -> Dict[str, Any]:
     load_dotenv(ROOT_DIR / "backend" / ".env")
     return {
         "nano_banana_api_key": os.getenv("NANO_BANANA_API_KEY"),
+        "nano_banana_api_keys": os.getenv("NANO_BANANA_API_KEYS"),
         "nano_banana_model": os.getenv("NANO_BANANA_MODEL"),
         "nano_banana_base_url": os.getenv("NANO_BANANA_BASE_URL"),
         "nano_banana_timeout": os.getenv("NANO_BANANA_TIMEOUT"),
@@ -60,6 +162,8 @@ def _load_env_config() -> Dict[str, Any]:
         "nano_banana_enable_search": os.getenv("NANO_BANANA_ENABLE_SEARCH"),
         "nano_banana_proxy": os.getenv("NANO_BANANA_PROXY"),
         "nano_banana_trust_env": os.getenv("NANO_BANANA_TRUST_ENV"),
+        "watchdog_enabled": os.getenv("TINY_CRAFT_WATCHDOG"),
+        "webhook_secret": os.getenv("TINY_CRAFT_WEBHOOK_SECRET"),
     }
 
 
@@ -69,12 +173,12 @@ def _apply_overrides(base: AppConfig, overrides: Dict[str, Any]) -> AppConfig:
             continue
         if not hasattr(base, key):
             continue
-        if key in {"nano_banana_timeout", "nano_banana_max_images"}:
+        if key in _INT_KEYS:
             try:
                 setattr(base, key, int(value))
             except (TypeError, ValueError):
                 continue
-        elif key in {"nano_banana_enable_search", "nano_banana_trust_env"}:
+        elif key in _BOOL_KEYS:
             if isinstance(value, str):
                 coerced = _coerce_bool(value)
                 if coerced is None:
@@ -98,6 +202,10 @@ def load_config() -> AppConfig:
     env_config["nano_banana_trust_env"] = _coerce_bool(
         env_config.get("nano_banana_trust_env")
     )
+    env_config["watchdog_enabled"] = _coerce_bool(env_config.get("watchdog_enabled"))
+    env_config["nano_banana_api_keys"] = _split_keys(
+        env_config.get("nano_banana_api_keys")
+    )
     base = _apply_overrides(base, env_config)
     return base
 
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from .nano_banana import UpstreamUnavailableError
+
+
+class Deadline:
+    """A point in time by which a job must finish, tracked on the monotonic clock."""
+
+    def __init__(self, seconds: float) -> None:
+        self.at = time.monotonic() + seconds
+        self.wall_at = time.time() + seconds
+
+    @classmethod
+    def from_request(
+        cls,
+        timeout: Optional[float],
+        deadline: Optional[float],
+        default: float,
+    ) -> Optional["Deadline"]:
+        """
+        Earliest of a relative timeout (seconds), an absolute unix timestamp
+        and the configured default; None when none of them is set.
+        """
+        budgets = []
+        if timeout is not None:
+            budgets.append(timeout)
+        if deadline is not None:
+            budgets.append(deadline - time.time())
+        if default > 0:
+            budgets.append(default)
+        if not budgets:
+            return None
+        return cls(min(budgets))
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str) -> None:
+        if self.expired():
+            raise UpstreamUnavailableError(
+                "deadline_exceeded", f"任务已超时：{stage}阶段前已超过截止时间"
+            )
+
+    def cap(self, seconds: Optional[float]) -> float:
+        """The smaller of `seconds` and the remaining budget; None is unbounded."""
+        remaining = self.remaining()
+        return remaining if seconds is None else min(seconds, remaining)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urljoin
+
+import httpx
+
+from .config import AppConfig, load_config
+from .nano_banana import _health_base_url, classify_error
+from .pool import build_members
+
+logger = logging.getLogger("uvicorn.error")
+
+# Known per-model input image limits, used when the models listing does not
+# carry a maxInputImages field (the public Gemini listing does not).
+KNOWN_IMAGE_LIMITS = (
+    ("gemini-2.5-flash-image", 3),
+    ("gemini-3-pro-image", 14),
+)
+DOWN_STATUSES = {"auth_failed", "network_unreachable", "upstream_error"}
+
+
+def _model_entry(item: Dict[str, Any]) -> tuple[str, dict]:
+    name = str(item.get("name", ""))
+    if name.startswith("models/"):
+        name = name[len("models/"):]
+    entry = {
+        "display_name": item.get("displayName"),
+        "input_token_limit": item.get("inputTokenLimit"),
+        "output_token_limit": item.get("outputTokenLimit"),
+        "max_input_images": item.get("maxInputImages"),
+        "methods": item.get("supportedGenerationMethods", []),
+    }
+    return name, {key: value for key, value in entry.items() if value is not None}
+
+
+class HealthMonitor:
+    """
+    Periodically probes the upstream models listing with a pooled client and
+    caches the outcome plus per-model metadata. Every upstream pool member is
+    probed; the upstream only counts as down when none of them answers.
+    """
+
+    def __init__(self) -> None:
+        self.status = "unknown"
+        self.message = ""
+        self.checked_at: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.models: Dict[str, dict] = {}
+        self.members: Dict[str, dict] = {}
+        self.interval = 60.0
+        self._checked_monotonic: Optional[float] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_key: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, interval: float) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self.interval = interval
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                config = await asyncio.to_thread(load_config)
+                await self.probe(config)
+            except Exception:  # pragma: no cover - keep the monitor alive
+                logger.exception("Health probe crashed")
+            await asyncio.sleep(self.interval)
+
+    async def _get_client(self, config: AppConfig) -> httpx.AsyncClient:
+        key = (config.nano_banana_proxy, config.nano_banana_trust_env)
+        if self._client is None or key != self._client_key:
+            if self._client is not None:
+                await self._client.aclose()
+            self._client = httpx.AsyncClient(
+                proxy=config.nano_banana_proxy,
+                trust_env=config.nano_banana_trust_env,
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+            )
+            self._client_key = key
+        return self._client
+
+    async def _probe_member(
+        self, client: httpx.AsyncClient, config: AppConfig
+    ) -> tuple[str, str, Optional[float], Optional[Dict[str, dict]]]:
+        """(status, message, elapsed, models) for one upstream key/endpoint."""
+        if not config.nano_banana_api_key:
+            return "auth_failed", "鉴权失败：缺少 API Key", None, None
+        url = urljoin(_health_base_url(config), "models")
+        started = time.monotonic()
+        try:
+            resp = await client.get(
+                url,
+                params={"key": config.nano_banana_api_key, "pageSize": 1000},
+                timeout=min(config.nano_banana_timeout or 30, 30),
+            )
+        except Exception as exc:  # pragma: no cover - network depends on env
+            status, message = classify_error(exc)
+            return status, message, time.monotonic() - started, None
+        elapsed = time.monotonic() - started
+        if resp.status_code in (401, 403):
+            return "auth_failed", "鉴权失败：API Key 无效或无权限", elapsed, None
+        if resp.status_code == 429:
+            return "rate_limited", "请求过于频繁：请稍后重试", elapsed, None
+        if resp.status_code >= 400:
+            return (
+                "upstream_error",
+                f"上游服务异常：HTTP {resp.status_code}",
+                elapsed,
+                None,
+            )
+        models = None
+        try:
+            items = resp.json().get("models", [])
+            models = dict(_model_entry(item) for item in items)
+        except ValueError:
+            pass
+        return "ok", "连接正常", elapsed, models
+
+    async def probe(self, config: AppConfig) -> dict:
+        members = build_members(config)
+        client = await self._get_client(config)
+        results = await asyncio.gather(
+            *(self._probe_member(client, member.config) for member in members)
+        )
+        self.members = {
+            member.name: {
+                "status": status,
+                "message": message,
+                "latency_ms": round(elapsed * 1000, 1) if elapsed is not None else None,
+            }
+            for member, (status, message, elapsed, _) in zip(members, results)
+        }
+        healthy = [result for result in results if result[0] == "ok"]
+        if healthy:
+            status, message, elapsed, models = min(
+                healthy, key=lambda result: result[2] or 0.0
+            )
+            if models is not None:
+                self.models = models
+        elif results:
+            status, message, elapsed, _ = results[0]
+        else:
+            status, message, elapsed = "auth_failed", "鉴权失败：缺少 API Key", None
+        self._record(status, message, elapsed)
+        return self.snapshot()
+
+    def _record(self, status: str, message: str, elapsed: Optional[float]) -> None:
+        if status != self.status:
+            log = logger.info if status == "ok" else logger.warning
+            log("Upstream health: %s (%s)", status, message)
+        self.status = status
+        self.message = message
+        self.checked_at = time.time()
+        self._checked_monotonic = time.monotonic()
+        self.latency_ms = round(elapsed * 1000, 1) if elapsed is not None else None
+        self.consecutive_failures = 0 if status == "ok" else self.consecutive_failures + 1
+
+    def is_down(self) -> bool:
+        """True when the latest probe failed and is fresh enough to trust."""
+        if self.status not in DOWN_STATUSES or self._checked_monotonic is None:
+            return False
+        return time.monotonic() - self._checked_monotonic <= self.interval * 2
+
+    def image_limit(self, config: AppConfig) -> int:
+        model_name = config.nano_banana_model
+        listed = self.models.get(model_name, {}).get("max_input_images")
+        if isinstance(listed, int) and listed > 0:
+            model_limit = listed
+        else:
+            model_limit = config.nano_banana_max_images
+            for prefix, limit in KNOWN_IMAGE_LIMITS:
+                if model_name.startswith(prefix):
+                    model_limit = limit
+                    break
+        return max(1, min(model_limit, config.nano_banana_max_images))
+
+    def snapshot(self) -> dict:
+        return {
+            "status": self.status,
+            "message": self.message,
+            "checked_at": self.checked_at,
+            "latency_ms": self.latency_ms,
+            "consecutive_failures": self.consecutive_failures,
+            "interval_s": self.interval,
+            "models": self.models,
+            "members": self.members,
+        }
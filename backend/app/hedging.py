@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Optional
+
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Sliding window of recent successful upstream latencies, in seconds."""
+
+    def __init__(self, window: int = 200) -> None:
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, value: float) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * value / 100))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """
+    Caps hedges at `ratio` of the last `window` calls, so a slow upstream
+    cannot double the request volume.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self.calls: deque[bool] = deque(maxlen=window)
+        self.hedges = 0
+        self.wins = 0
+        self.denied = 0
+
+    def record_call(self) -> None:
+        self.calls.append(False)
+
+    def try_hedge(self, ratio: float) -> bool:
+        used = sum(self.calls)
+        if used + 1 > ratio * len(self.calls):
+            self.denied += 1
+            return False
+        # Mark the most recent unhedged call; close enough for a rolling cap.
+        for index in range(len(self.calls) - 1, -1, -1):
+            if not self.calls[index]:
+                self.calls[index] = True
+                break
+        self.hedges += 1
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "window_calls": len(self.calls),
+            "window_hedges": sum(self.calls),
+            "hedges": self.hedges,
+            "hedge_wins": self.wins,
+            "denied": self.denied,
+        }
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from collections import deque
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image, ImageChops
+
+
+def _open(data: bytes) -> Image.Image:
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+def _encode_png(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def changed_mask(base: Image.Image, result: Image.Image, threshold: int) -> Image.Image:
+    """255 where any channel differs by more than `threshold`, else 0."""
+    diff = ImageChops.difference(base.convert("RGB"), result.convert("RGB"))
+    red, green, blue = diff.split()
+    strongest = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+    return strongest.point(lambda value: 255 if value > threshold else 0)
+
+
+def _changed_cells(mask: Image.Image, cell: int) -> tuple[bytes, int, int]:
+    # Averaging in float mode keeps a single changed pixel visible per cell;
+    # scaling before the cast to L turns any non-zero average into >= 1.
+    grid = mask.convert("F").reduce(cell).point(lambda value: value * cell * cell)
+    grid = grid.convert("L")
+    return grid.tobytes(), grid.width, grid.height
+
+
+def _components(cells: bytes, width: int, height: int) -> list[tuple[int, int, int, int]]:
+    """Bounding boxes (in cells) of 8-connected groups of changed cells."""
+    seen = bytearray(len(cells))
+    boxes = []
+    for start, value in enumerate(cells):
+        if not value or seen[start]:
+            continue
+        seen[start] = 1
+        queue = deque([start])
+        left = right = start % width
+        top = bottom = start // width
+        while queue:
+            index = queue.popleft()
+            x, y = index % width, index // width
+            left, right = min(left, x), max(right, x)
+            top, bottom = min(top, y), max(bottom, y)
+            for ny in (y - 1, y, y + 1):
+                if ny < 0 or ny >= height:
+                    continue
+                for nx in (x - 1, x, x + 1):
+                    if nx < 0 or nx >= width:
+                        continue
+                    neighbour = ny * width + nx
+                    if cells[neighbour] and not seen[neighbour]:
+                        seen[neighbour] = 1
+                        queue.append(neighbour)
+        boxes.append((left, top, right + 1, bottom + 1))
+    return boxes
+
+
+def compute_delta(
+    base_bytes: bytes,
+    result_bytes: bytes,
+    threshold: int = 12,
+    cell: int = 32,
+    max_boxes: int = 32,
+    max_ratio: float = 0.5,
+) -> Optional[dict]:
+    """
+    Diff an image result against its input. Returns the changed-area mask
+    (PNG) and the changed boxes with PNG patches cut from the result, or None
+    when the sizes differ and patches cannot be pasted back onto the input.
+    `available` is False when patches would cover more than `max_ratio` of
+    the image, in which case the full result is the cheaper download.
+    """
+    base = _open(base_bytes)
+    result = _open(result_bytes)
+    if base.size != result.size:
+        return None
+    mask = changed_mask(base, result, threshold)
+    cells, grid_width, grid_height = _changed_cells(mask, max(1, cell))
+    boxes = []
+    for left, top, right, bottom in _components(cells, grid_width, grid_height):
+        box = (
+            left * cell,
+            top * cell,
+            min(result.width, right * cell),
+            min(result.height, bottom * cell),
+        )
+        tight = mask.crop(box).getbbox()
+        if tight is not None:
+            boxes.append(
+                (box[0] + tight[0], box[1] + tight[1], box[0] + tight[2], box[1] + tight[3])
+            )
+    if len(boxes) > max_boxes:
+        boxes = [
+            (
+                min(item[0] for item in boxes),
+                min(item[1] for item in boxes),
+                max(item[2] for item in boxes),
+                max(item[3] for item in boxes),
+            )
+        ]
+    area = result.width * result.height
+    covered = sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+    changed = mask.histogram()[255]
+    available = covered <= area * max_ratio
+    if not available:
+        boxes = []
+    patches = [
+        {
+            "x": left,
+            "y": top,
+            "width": right - left,
+            "height": bottom - top,
+            "data": base64.b64encode(
+                _encode_png(result.crop((left, top, right, bottom)))
+            ).decode("ascii"),
+        }
+        for left, top, right, bottom in boxes
+    ]
+    return {
+        "base_sha256": hashlib.sha256(base_bytes).hexdigest(),
+        "width": result.width,
+        "height": result.height,
+        "changed_ratio": round(changed / area, 6) if area else 0.0,
+        "covered_ratio": round(covered / area, 6) if area else 0.0,
+        "available": available,
+        "patches": patches,
+        "mask": _encode_png(mask.convert("1")),
+    }
@@ -1,27 +1,76 @@
 from __future__ import annotations
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
+import hashlib
 import json
 import logging
+import tempfile
 import uuid
+from io import BytesIO
 from pathlib import Path
-from typing import AsyncGenerator, Optional
+from typing import TYPE_CHECKING, AsyncGenerator, BinaryIO, Dict, Optional
 
-from fastapi import BackgroundTasks, FastAPI, File, Form, HTTPException, UploadFile
-from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi import (
+    BackgroundTasks,
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    WebSocket,
+)
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from urllib.parse import quote
 
-from .config import load_config, save_config
-from .models import JobResult, JobStatus
+from .blobs import BlobError, BlobStore, UploadState, get_blob_store
+from .channel import JobChannel
+from .config import AppConfig, load_config, save_config
+from .deadline import Deadline
+from .health import HealthMonitor
+from .models import (
+    BlobInfo,
+    BlobUploadRequest,
+    BlobUploadStatus,
+    ImageDelta,
+    JobResult,
+    JobStatus,
+    TextPatch,
+)
 from .nano_banana import (
-    apply_edit,
-    check_connectivity,
+    UpstreamUnavailableError,
     classify_error,
-    edit_image,
     extract_error_context,
 )
-from .storage import JobStore
+from .pool import warm_up_members
+from .startup import StartupTimer
+from .storage import TERMINAL_EVENTS, JobRecord, JobState, JobStore
+from .text_index import IndexCache, OffsetIndex, build_index
+from .text_patch import (
+    CHUNK_SIZE,
+    EditRangeError,
+    TextEdit,
+    apply_planned,
+    patched_size,
+    plan_edits,
+)
+from .tracing import JobTrace, close_exporter, schedule_export
+from .upstream import breaker, call_edit, hedging_snapshot, pool
+from .watchdog import LoopWatchdog
+from .webhooks import WebhookDispatcher, WebhookError, validate_callback_url
+
+if TYPE_CHECKING:
+    from .tiling import Tile
+
+startup = StartupTimer(origin=_IMPORT_STARTED)
+startup.mark("imported")
 
 app = FastAPI(
     title="tiny-craft backend",
@@ -33,7 +82,13 @@ webui_dir = Path(__file__).resolve().parents[1] / "webui"
 webui_dir.mkdir(parents=True, exist_ok=True)
 app.mount("/webui", StaticFiles(directory=str(webui_dir), html=True), name="webui")
 store = JobStore()
+TEXT_SPOOL_LIMIT = 8 * 1024 * 1024
+text_indexes = IndexCache()
+watchdog = LoopWatchdog()
+health = HealthMonitor()
+webhooks = WebhookDispatcher()
 logger = logging.getLogger("uvicorn.error")
+startup.mark("app_created")
 
 
 @app.get("/", include_in_schema=False)
@@ -41,32 +96,196 @@ async def index() -> RedirectResponse:
     return RedirectResponse(url="/webui/")
 
 
+def _webui_source_hash(src: Path) -> str:
+    """Same digest as the build stamp written by frontend/vite.config.js."""
+    digest = hashlib.sha256()
+    files = sorted(
+        path.relative_to(src).as_posix() for path in src.rglob("*") if path.is_file()
+    )
+    for name in files:
+        digest.update(name.encode("utf-8") + b"\0")
+        digest.update((src / name).read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def _webui_is_stale() -> bool:
+    """True when frontend/src is present and the bundle was not built from it."""
+    src = Path(__file__).resolve().parents[2] / "frontend" / "src"
+    if not src.is_dir():
+        return False
+    try:
+        stamp = json.loads((webui_dir / "build.json").read_text("utf-8"))
+    except (OSError, ValueError):
+        stamp = {}
+    return stamp.get("source_sha256") != _webui_source_hash(src)
+
+
+@app.on_event("startup")
+async def check_webui() -> None:
+    if await asyncio.to_thread(_webui_is_stale):
+        logger.warning(
+            "The web UI in %s was not built from the current frontend/src; "
+            "run `npm run build` in frontend/",
+            webui_dir,
+        )
+
+
+_warmup: Optional[asyncio.Task] = None
+
+
 @app.on_event("startup")
 async def startup_check() -> None:
+    global _warmup
+
     async def _run() -> None:
-        result = await asyncio.to_thread(check_connectivity, load_config())
+        # Runs in the background while the server already accepts requests,
+        # so neither startup nor the first job pays for the SDK import or
+        # for opening the async client's connections.
+        with startup.phase("warmup"):
+            config = await asyncio.to_thread(load_config)
+            result = await warm_up_members(config)
+        for name, seconds in result.get("timings", {}).items():
+            startup.record(f"warmup_{name}", seconds)
         status = result.get("status")
         message = result.get("message", "")
         if status == "ok":
             logger.info("Connectivity check ok")
         else:
             logger.warning("Connectivity check failed: %s (%s)", message, status)
+        logger.info("Startup timings: %s", startup.snapshot())
+
+    _warmup = asyncio.create_task(_run())
+
+
+@app.on_event("startup")
+async def start_watchdog() -> None:
+    config = await asyncio.to_thread(load_config)
+    if not config.watchdog_enabled:
+        return
+    watchdog.interval = max(config.watchdog_interval_ms, 1) / 1000
+    watchdog.threshold = max(config.watchdog_threshold_ms, 1) / 1000
+    watchdog.start()
+    logger.info(
+        "Event loop watchdog started: interval=%sms threshold=%sms",
+        config.watchdog_interval_ms,
+        config.watchdog_threshold_ms,
+    )
+
+
+@app.on_event("startup")
+async def start_health_monitor() -> None:
+    config = await asyncio.to_thread(load_config)
+    if config.health_interval > 0:
+        health.start(config.health_interval)
+
+
+async def _evict_jobs(ttl: float) -> None:
+    while True:
+        await asyncio.sleep(min(ttl, 60))
+        await _discard_records(store.evict_finished(ttl))
+
+
+async def _discard_records(records: list[JobRecord]) -> None:
+    for record in records:
+        if record.result_path is not None:
+            await asyncio.to_thread(Path(record.result_path).unlink, missing_ok=True)
+
+
+_evictor: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def start_job_eviction() -> None:
+    global _evictor
+    config = await asyncio.to_thread(load_config)
+    if config.job_ttl > 0:
+        _evictor = asyncio.create_task(_evict_jobs(config.job_ttl))
+
+
+@app.on_event("startup")
+async def startup_ready() -> None:
+    # Registered after the other startup hooks: marks when serving begins.
+    startup.mark("ready")
+
+
+@app.on_event("shutdown")
+async def stop_watchdog() -> None:
+    await watchdog.stop()
+
+
+@app.on_event("shutdown")
+async def stop_health_monitor() -> None:
+    await health.stop()
+
+
+@app.on_event("shutdown")
+async def stop_webhooks() -> None:
+    await webhooks.stop()
+
+
+@app.on_event("shutdown")
+async def stop_trace_export() -> None:
+    await close_exporter()
 
-    asyncio.create_task(_run())
+
+@app.on_event("shutdown")
+async def stop_job_eviction() -> None:
+    if _evictor is not None:
+        _evictor.cancel()
+    # Result files are temporary; none of them outlive the process.
+    await _discard_records(store.evict_finished(0))
+
+
+@app.get("/api/health")
+async def get_health() -> dict:
+    data = health.snapshot()
+    data["down"] = health.is_down()
+    data["circuit"] = breaker.snapshot()
+    return data
+
+
+@app.get("/api/metrics")
+async def get_metrics() -> dict:
+    return {
+        "event_loop": watchdog.snapshot(),
+        "text_index": text_indexes.stats(),
+        "startup": startup.snapshot(),
+        "circuit": breaker.snapshot(),
+        "upstream_pool": pool.snapshot(),
+        "hedging": hedging_snapshot(),
+        "webhooks": webhooks.snapshot(),
+    }
 
 
 @app.get("/api/config")
 async def get_config() -> dict:
-    config = load_config()
+    config = await asyncio.to_thread(load_config)
     return config.public_dict()
 
 
 @app.post("/api/config")
 async def update_config(payload: dict) -> dict:
-    updated = save_config(payload)
+    updated = await asyncio.to_thread(save_config, payload)
     return updated.public_dict()
 
 
+def _finish_trace(
+    job_id: str,
+    record: JobRecord,
+    kind: str,
+    config: AppConfig,
+) -> dict:
+    timings = record.trace.to_dict()
+    if config.trace_export_url:
+        schedule_export(
+            config.trace_export_url,
+            record.trace,
+            f"{kind}_job",
+            {"job.id": job_id, "job.kind": kind, "job.status": record.status},
+        )
+    return timings
+
+
 def _build_region_hint(
     region_x: Optional[int],
     region_y: Optional[int],
@@ -82,24 +301,54 @@ def _build_region_hint(
     )
 
 
+def _write_text_result(
+    source: BinaryIO,
+    source_size: int,
+    edits: list[TextEdit],
+    offsets: Dict[int, int],
+) -> tuple[Optional[bytes], Optional[str]]:
+    """
+    Small results are returned as bytes; larger ones are written to a
+    closed temp file whose path is returned, removed when the job is evicted.
+    """
+    expected = patched_size(source_size, edits, offsets)
+    if expected <= TEXT_SPOOL_LIMIT:
+        buffer = BytesIO()
+        apply_planned(source, edits, offsets, buffer)
+        return buffer.getvalue(), None
+    with tempfile.NamedTemporaryFile(
+        prefix="tiny-craft-", suffix=".result", delete=False
+    ) as sink:
+        try:
+            apply_planned(source, edits, offsets, sink)
+        except BaseException:
+            sink.close()
+            Path(sink.name).unlink(missing_ok=True)
+            raise
+    return None, sink.name
+
+
 async def run_job(
     job_id: str,
-    content: bytes,
-    region_start: int,
-    region_end: int,
-    description: str,
+    source: BinaryIO,
+    source_size: int,
+    edits: list[TextEdit],
+    offsets: Dict[int, int],
     file_name: Optional[str],
     mime: Optional[str],
 ) -> None:
     record = store.get(job_id)
     if record is None:
+        source.close()
         return
+    config = await asyncio.to_thread(load_config)
+    record.trace.end("queue_wait")
+    progress_span = record.trace.start("progress")
     steps = [
-        (10, "queued"),
-        (30, "validating"),
-        (60, "processing"),
-        (90, "finalizing"),
-        (100, "completed"),
+        (10, JobState.QUEUED),
+        (30, JobState.VALIDATING),
+        (60, JobState.PROCESSING),
+        (90, JobState.FINALIZING),
     ]
     for progress, status in steps:
         await asyncio.sleep(0.6)
@@ -116,92 +365,479 @@ async def run_job(
             },
         )
 
+    record.trace.finish(progress_span)
+
     try:
-        record.result_bytes = apply_edit(content, region_start, region_end, description)
+        with record.trace.span("apply_edit", size=source_size, edits=len(edits)):
+            record.result_bytes, record.result_path = await asyncio.to_thread(
+                _write_text_result, source, source_size, edits, offsets
+            )
         record.result_name = file_name
         record.result_mime = mime
     except Exception as exc:  # pragma: no cover - surfaced to client
         logger.exception("Text job failed: job_id=%s", job_id)
-        record.status = "failed"
+        record.status = JobState.FAILED
         record.message = str(exc)
         await store.push_event(
             job_id,
             {
                 "type": "failed",
                 "message": record.message,
+                "timings": _finish_trace(job_id, record, "text", config),
             },
         )
         return
-    await store.push_event(job_id, {"type": "completed"})
+    finally:
+        source.close()
+    # Completed only once the result is stored, so a client that sees the
+    # status can fetch the result right away.
+    record.status = JobState.COMPLETED
+    record.progress = 100
+    record.message = f"{record.status} ({record.progress}%)"
+    await store.push_event(
+        job_id,
+        {
+            "type": "completed",
+            "timings": _finish_trace(job_id, record, "text", config),
+        },
+    )
+
+
+def _parse_text_edits(
+    edits: Optional[str],
+    region_start: Optional[int],
+    region_end: Optional[int],
+    description: Optional[str],
+) -> list[TextEdit]:
+    if edits:
+        try:
+            items = json.loads(edits)
+            if not isinstance(items, list) or not items:
+                raise ValueError("edits must be a non-empty list")
+            parsed = []
+            for item in items:
+                if not isinstance(item, dict):
+                    raise TypeError("each edit must be an object")
+                replacement = item.get("replacement")
+                if replacement is None:
+                    replacement = ""
+                elif not isinstance(replacement, str):
+                    raise TypeError("replacement must be a string")
+                parsed.append(TextEdit(int(item["start"]), int(item["end"]), replacement))
+            return parsed
+        except (ValueError, TypeError, KeyError, AttributeError):
+            raise HTTPException(status_code=400, detail="Invalid edits payload")
+    if region_start is None or region_end is None or description is None:
+        raise HTTPException(status_code=400, detail="Missing region or description")
+    return [TextEdit(region_start, region_end, description)]
+
+
+def _hash_source(source: BinaryIO) -> tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    source.seek(0)
+    return size, digest.hexdigest()
+
+
+async def _take_upload(upload: UploadFile) -> tuple[BinaryIO, int, str]:
+    """
+    Use the file Starlette already spooled instead of copying it. The form
+    closes its uploads before background tasks run, so the job takes over
+    the handle and leaves an empty one behind for that close.
+    """
+    source = upload.file
+    upload.file = BytesIO()
+    size, digest = await asyncio.to_thread(_hash_source, source)
+    return source, size, digest
+
+
+def _text_index(source: BinaryIO, digest: str) -> tuple[OffsetIndex, bool]:
+    index = text_indexes.get(digest)
+    if index is not None:
+        return index, True
+    index = build_index(source)
+    text_indexes.put(digest, index)
+    return index, False
+
+
+def _blob_store(config: AppConfig) -> BlobStore:
+    return get_blob_store(config.blob_dir, config.blob_max_bytes, config.blob_ttl)
+
+
+async def _blob_info(blobs: BlobStore, blob_id: str) -> dict:
+    try:
+        info = await asyncio.to_thread(blobs.info, blob_id)
+    except BlobError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Blob not found: {blob_id}")
+    return info
+
+
+async def _read_blob(blobs: BlobStore, blob_id: str) -> tuple[bytes, dict]:
+    info = await _blob_info(blobs, blob_id)
+    try:
+        data = await asyncio.to_thread(blobs.read, blob_id)
+    except BlobError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return data, info
+
+
+def _require_image_mime(value: Optional[str]) -> None:
+    # Blobs carry whatever mime the uploader declared; unknown is allowed.
+    if value and not value.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Only image uploads are supported")
+
+
+async def _callback_url(value: Optional[str], config: AppConfig) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return await asyncio.to_thread(validate_callback_url, value, config)
+    except WebhookError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _upload_status(state: UploadState, config: AppConfig) -> BlobUploadStatus:
+    return BlobUploadStatus(
+        upload_id=state.sha256,
+        size=state.size,
+        chunk_size=config.blob_chunk_size,
+        missing=state.missing(),
+    )
+
+
+@app.get("/api/blobs/{blob_id}", response_model=BlobInfo)
+async def get_blob(blob_id: str) -> BlobInfo:
+    config = await asyncio.to_thread(load_config)
+    return BlobInfo(**await _blob_info(_blob_store(config), blob_id))
+
+
+@app.post("/api/blobs/uploads", response_model=BlobUploadStatus)
+async def create_blob_upload(payload: BlobUploadRequest) -> BlobUploadStatus:
+    """
+    Start or resume an upload for a content hash. When the blob already
+    exists nothing is missing and the blob is returned right away.
+    """
+    config = await asyncio.to_thread(load_config)
+    blobs = _blob_store(config)
+    sha256 = payload.sha256.lower()
+    try:
+        existing = await asyncio.to_thread(blobs.info, sha256)
+        if existing is not None and existing["size"] == payload.size:
+            return BlobUploadStatus(
+                upload_id=sha256,
+                size=payload.size,
+                chunk_size=config.blob_chunk_size,
+                missing=[],
+                blob=BlobInfo(**existing),
+            )
+        state = await asyncio.to_thread(
+            blobs.start_upload, sha256, payload.size, payload.mime
+        )
+    except BlobError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _upload_status(state, config)
+
+
+@app.get("/api/blobs/uploads/{upload_id}", response_model=BlobUploadStatus)
+async def get_blob_upload(upload_id: str) -> BlobUploadStatus:
+    config = await asyncio.to_thread(load_config)
+    try:
+        state = await asyncio.to_thread(_blob_store(config).upload_state, upload_id)
+    except BlobError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if state is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return _upload_status(state, config)
+
+
+@app.put("/api/blobs/uploads/{upload_id}", response_model=BlobUploadStatus)
+async def put_blob_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+) -> BlobUploadStatus:
+    """
+    Write the raw request body at `offset`. Chunks may arrive in any order;
+    the body goes to the part file as it streams in, CHUNK_SIZE at a time.
+    """
+    config = await asyncio.to_thread(load_config)
+    blobs = _blob_store(config)
+    limit = max(config.blob_chunk_size, CHUNK_SIZE) * 2
+    written = 0
+    buffer = bytearray()
+    try:
+        async for piece in request.stream():
+            buffer.extend(piece)
+            if written + len(buffer) > limit:
+                raise HTTPException(status_code=413, detail="Chunk too large")
+            if len(buffer) >= CHUNK_SIZE:
+                await asyncio.to_thread(
+                    blobs.write_at, upload_id, offset + written, bytes(buffer)
+                )
+                written += len(buffer)
+                buffer.clear()
+        if buffer:
+            await asyncio.to_thread(
+                blobs.write_at, upload_id, offset + written, bytes(buffer)
+            )
+            written += len(buffer)
+        state = await asyncio.to_thread(
+            blobs.record_range, upload_id, offset, offset + written
+        )
+    except BlobError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _upload_status(state, config)
+
+
+@app.post("/api/blobs/uploads/{upload_id}/complete", response_model=BlobInfo)
+async def complete_blob_upload(upload_id: str) -> BlobInfo:
+    config = await asyncio.to_thread(load_config)
+    try:
+        info = await asyncio.to_thread(_blob_store(config).complete, upload_id)
+    except BlobError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return BlobInfo(**info)
 
 
 @app.post("/api/jobs", response_model=JobStatus)
 async def create_job(
     background: BackgroundTasks,
-    file: UploadFile = File(...),
-    region_start: int = Form(...),
-    region_end: int = Form(...),
-    description: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    blob: Optional[str] = Form(
+        None, description="Id of an uploaded blob to use instead of file."
+    ),
+    region_start: Optional[int] = Form(None),
+    region_end: Optional[int] = Form(None),
+    description: Optional[str] = Form(None),
+    edits: Optional[str] = Form(
+        None,
+        description='JSON list of {"start", "end", "replacement"} code-point edits. '
+        "Overrides region_start/region_end/description.",
+    ),
     file_name: Optional[str] = Form(None),
     mime: Optional[str] = Form(None),
+    callback_url: Optional[str] = Form(
+        None,
+        description="URL that receives a signed POST once the job completes or "
+        "fails. Callbacks for the same URL are batched.",
+    ),
 ) -> JobStatus:
-    if region_end < region_start:
-        raise HTTPException(status_code=400, detail="Invalid region range")
-    job_id = uuid.uuid4().hex
-    record = store.create(job_id)
-    record.status = "queued"
-    record.progress = 0
-    raw = await file.read()
+    trace = JobTrace()
+    if (file is None) == (blob is None):
+        raise HTTPException(status_code=400, detail="Provide either file or blob")
+    requested = _parse_text_edits(edits, region_start, region_end, description)
+    config = await asyncio.to_thread(load_config)
+    callback = await _callback_url(callback_url, config)
+    blob_info = None
+    with trace.span("upload_read"):
+        if blob is not None:
+            blobs = _blob_store(config)
+            blob_info = await _blob_info(blobs, blob)
+            source = await asyncio.to_thread(blobs.open, blob)
+            source_size, digest = blob_info["size"], blob
+        else:
+            source, source_size, digest = await _take_upload(file)
     try:
-        text = raw.decode("utf-8")
+        with trace.span("index", size=source_size) as index_span:
+            index, cached = await asyncio.to_thread(_text_index, source, digest)
+            index_span.attributes["cached"] = cached
+        with trace.span("validate", edits=len(requested)):
+            ordered, offsets = await asyncio.to_thread(
+                plan_edits, source, requested, index
+            )
     except UnicodeDecodeError:
+        source.close()
         raise HTTPException(status_code=415, detail="Only UTF-8 text is supported")
-    if region_end > len(text):
-        raise HTTPException(status_code=400, detail="Region exceeds file length")
-    selected_name = file_name or file.filename
-    selected_mime = mime or file.content_type
+    except EditRangeError as exc:
+        source.close()
+        raise HTTPException(status_code=400, detail=str(exc))
+    job_id = uuid.uuid4().hex
+    record = store.create(job_id, trace)
+    record.progress = 0
+    record.result_patch = {
+        "base_sha256": digest,
+        "base_size": source_size,
+        "base_length": index.total_chars,
+        "result_size": patched_size(source_size, ordered, offsets),
+        "edits": [
+            {
+                "start": item.start,
+                "end": item.end,
+                "byte_start": offsets[item.start],
+                "byte_end": offsets[item.end],
+                "replacement": item.replacement,
+            }
+            for item in ordered
+        ],
+    }
+    if blob_info is not None:
+        selected_name = file_name
+        selected_mime = mime or blob_info["mime"]
+    else:
+        selected_name = file_name or file.filename
+        selected_mime = mime or file.content_type
+    if callback is not None:
+        webhooks.watch(store, job_id, callback, config)
+    trace.start("queue_wait")
     background.add_task(
         run_job,
         job_id,
-        raw,
-        region_start,
-        region_end,
-        description,
+        source,
+        source_size,
+        ordered,
+        offsets,
         selected_name,
         selected_mime,
     )
     return JobStatus(id=job_id, status=record.status, progress=record.progress)
 
 
-@app.get("/api/jobs/{job_id}", response_model=JobStatus)
-async def get_job(job_id: str) -> JobStatus:
+MAX_BULK_IDS = 1000
+
+
+@app.get("/api/jobs")
+async def get_jobs(
+    ids: list[str] = Query(
+        ...,
+        description="Job ids, comma separated and/or as repeated ids parameters.",
+    ),
+    timings: bool = Query(False),
+) -> dict:
+    job_ids = list(
+        dict.fromkeys(item for value in ids for item in value.split(",") if item)
+    )
+    if len(job_ids) > MAX_BULK_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Too many ids: {len(job_ids)} > {MAX_BULK_IDS}"
+        )
+    found = store.get_many(job_ids)
+    return {
+        "jobs": [
+            record.snapshot(job_id, timings=timings)
+            for job_id, record in found.items()
+        ],
+        "missing": [job_id for job_id in job_ids if job_id not in found],
+    }
+
+
+@app.get("/api/jobs/{job_id}", responses={200: {"model": JobStatus}})
+async def get_job(job_id: str) -> dict:
+    # Polled often: the snapshot dict is returned as is, JobStatus only
+    # documents its shape.
     record = store.get(job_id)
     if record is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return JobStatus(
-        id=job_id,
-        status=record.status,
-        progress=record.progress,
-        message=record.message,
-    )
+    return record.snapshot(job_id, timings=True)
 
 
 @app.get("/api/jobs/{job_id}/result", response_model=JobResult)
 async def get_job_result(job_id: str) -> JobResult:
     record = store.get(job_id)
-    if record is None or record.result_bytes is None:
+    if record is None or not record.has_result:
         raise HTTPException(status_code=404, detail="Result not ready")
     return JobResult(
         id=job_id,
         file_name=record.result_name,
         mime=record.result_mime,
+        patch_available=record.result_patch is not None,
+        delta_available=record.delta_base is not None
+        or bool(record.result_delta and record.result_delta["available"]),
     )
 
 
+@app.get("/api/jobs/{job_id}/result/patch", response_model=TextPatch)
+async def download_result_patch(job_id: str) -> TextPatch:
+    """
+    Compact alternative to /result/file for text jobs: the edits applied to
+    the uploaded content (identified by base_sha256), sorted and
+    non-overlapping. Offsets refer to the base content.
+    """
+    record = store.get(job_id)
+    if record is None or not record.has_result:
+        raise HTTPException(status_code=404, detail="Result not ready")
+    if record.result_patch is None:
+        raise HTTPException(status_code=404, detail="Patch not available")
+    return TextPatch(id=job_id, **record.result_patch)
+
+
+_delta_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def _compute_delta(job_id: str, record: JobRecord) -> None:
+    from .image_diff import compute_delta
+
+    config = await asyncio.to_thread(load_config)
+    try:
+        delta = await asyncio.to_thread(
+            compute_delta,
+            record.delta_base,
+            record.result_bytes,
+            config.delta_threshold,
+            config.delta_cell,
+        )
+    except Exception:  # pragma: no cover - the full result is still served
+        logger.exception("Image delta failed: job_id=%s", job_id)
+        delta = None
+    if delta is not None:
+        record.result_mask = delta.pop("mask")
+        record.result_delta = delta
+    record.delta_base = None
+
+
+async def _image_delta(job_id: str, record: JobRecord) -> Optional[dict]:
+    """The job's delta, computed once on first use; concurrent callers share it."""
+    if record.delta_base is not None:
+        task = _delta_tasks.get(job_id)
+        if task is None:
+            task = asyncio.create_task(_compute_delta(job_id, record))
+            _delta_tasks[job_id] = task
+            task.add_done_callback(lambda _: _delta_tasks.pop(job_id, None))
+        await asyncio.shield(task)
+    return record.result_delta
+
+
+@app.get("/api/jobs/{job_id}/result/delta", response_model=ImageDelta)
+async def download_result_delta(job_id: str) -> ImageDelta:
+    """
+    Compact alternative to /result/file for localized image edits: PNG
+    patches of the changed areas with their offsets, to be pasted onto the
+    input image (identified by base_sha256). Differences no larger than
+    delta_threshold per channel are left out.
+    """
+    record = store.get(job_id)
+    if record is None or not record.has_result:
+        raise HTTPException(status_code=404, detail="Result not ready")
+    delta = await _image_delta(job_id, record)
+    if delta is None or not delta["available"]:
+        raise HTTPException(status_code=404, detail="Delta not available")
+    return ImageDelta(id=job_id, **{k: v for k, v in delta.items() if k != "available"})
+
+
+@app.get("/api/jobs/{job_id}/result/mask")
+async def download_result_mask(job_id: str) -> Response:
+    """Black/white PNG of the pixels the edit changed."""
+    record = store.get(job_id)
+    if record is None or not record.has_result:
+        raise HTTPException(status_code=404, detail="Result not ready")
+    await _image_delta(job_id, record)
+    if record.result_mask is None:
+        raise HTTPException(status_code=404, detail="Mask not available")
+    return Response(content=record.result_mask, media_type="image/png")
+
+
 @app.get("/api/jobs/{job_id}/result/file")
-async def download_result(job_id: str) -> StreamingResponse:
+async def download_result(job_id: str) -> Response:
     record = store.get(job_id)
-    if record is None or record.result_bytes is None:
+    if record is None or not record.has_result:
         raise HTTPException(status_code=404, detail="Result not ready")
     file_name = record.result_name or "result.bin"
     mime = record.result_mime or "application/octet-stream"
@@ -212,6 +848,8 @@ async def download_result(job_id: str) -> StreamingResponse:
             f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{encoded_name}'
         ),
     }
+    if record.result_path is not None:
+        return FileResponse(record.result_path, media_type=mime, headers=headers)
     return StreamingResponse(
         iter([record.result_bytes]),
         media_type=mime,
@@ -226,18 +864,24 @@ async def run_image_job(
     reference_images: list[bytes],
     file_name: Optional[str],
     mime: Optional[str],
+    region: Optional[tuple[int, int, int, int]] = None,
+    tiled: bool = False,
 ) -> None:
     record = store.get(job_id)
     if record is None:
         return
+    config = await asyncio.to_thread(load_config)
+    record.trace.end("queue_wait")
+    progress_span = record.trace.start("progress")
     steps = [
-        (10, "queued"),
-        (30, "uploading"),
-        (60, "processing"),
-        (90, "finalizing"),
-        (100, "completed"),
+        (10, JobState.QUEUED),
+        (30, JobState.UPLOADING),
+        (60, JobState.PROCESSING),
+        (90, JobState.FINALIZING),
     ]
     for progress, status in steps:
+        if record.deadline is not None and record.deadline.expired():
+            break
         await asyncio.sleep(0.6)
         record.status = status
         record.progress = progress
@@ -252,13 +896,59 @@ async def run_image_job(
             },
         )
 
+    record.trace.finish(progress_span)
+
+    async def _on_tile(tile: Tile, status: str, done: int, total: int) -> None:
+        await store.push_event(
+            job_id,
+            {
+                "type": "tile",
+                "index": tile.index,
+                "status": status,
+                "completed": done,
+                "total": total,
+                "box": [tile.left, tile.top, tile.right, tile.bottom],
+            },
+        )
+
+    async def _on_circuit(event: dict) -> None:
+        await store.push_event(job_id, event)
+
     try:
-        result = edit_image(image_bytes, prompt, load_config(), reference_images)
+        if config.health_fail_fast and health.is_down():
+            raise UpstreamUnavailableError(health.status, health.message)
+        if tiled:
+            from .tiling import edit_tiled
+
+            result = await edit_tiled(
+                image_bytes,
+                prompt,
+                config,
+                reference_images,
+                region=region,
+                on_tile=_on_tile,
+                trace=record.trace,
+                on_circuit=_on_circuit,
+                deadline=record.deadline,
+            )
+        else:
+            result = await call_edit(
+                image_bytes,
+                prompt + (_build_region_hint(*region) if region else ""),
+                config,
+                reference_images,
+                trace=record.trace,
+                on_circuit=_on_circuit,
+                deadline=record.deadline,
+            )
     except Exception as exc:  # pragma: no cover - surfaced to client
         kind, message = classify_error(exc)
-        logger.error("Image job context: %s", extract_error_context(exc))
-        logger.exception("Image job failed: job_id=%s", job_id)
-        record.status = "failed"
+        if isinstance(exc, UpstreamUnavailableError):
+            logger.warning("Image job skipped: job_id=%s (%s)", job_id, kind)
+        else:
+            logger.error("Image job context: %s", extract_error_context(exc))
+            logger.exception("Image job failed: job_id=%s", job_id)
+        record.status = JobState.FAILED
         record.message = message
         await store.push_event(
             job_id,
@@ -266,24 +956,50 @@ async def run_image_job(
                 "type": "failed",
                 "message": record.message,
                 "kind": kind,
+                "circuit": breaker.state,
+                "timings": _finish_trace(job_id, record, "image", config),
             },
         )
         return
 
     record.result_bytes = result
     record.result_name = file_name
-    record.result_mime = mime or "image/png"
-    await store.push_event(job_id, {"type": "completed"})
+    record.result_mime = "image/png" if tiled else mime or "image/png"
+    if config.delta_enabled:
+        # The delta is computed on the first /result/delta or /result/mask
+        # request; most clients only ever download the full result.
+        record.delta_base = image_bytes
+    record.status = JobState.COMPLETED
+    record.progress = 100
+    record.message = f"{record.status} ({record.progress}%)"
+    await store.push_event(
+        job_id,
+        {
+            "type": "completed",
+            "timings": _finish_trace(job_id, record, "image", config),
+        },
+    )
 
 
 @app.post("/api/image/jobs", response_model=JobStatus)
 async def create_image_job(
     background: BackgroundTasks,
-    image: UploadFile = File(...),
+    image: Optional[UploadFile] = File(None),
+    source_job_id: Optional[str] = Form(
+        None,
+        description="Use the result of a finished image job as the input image "
+        "instead of uploading it again.",
+    ),
+    image_blob: Optional[str] = Form(
+        None, description="Id of an uploaded blob to use as the input image."
+    ),
     references: Optional[list[UploadFile]] = File(
         None,
         description="Optional reference images (0-n). Submit multiple files with the same field name.",
     ),
+    reference_blobs: Optional[str] = Form(
+        None, description="Comma separated ids of uploaded blobs to use as references."
+    ),
     description: Optional[str] = Form(None),
     prompt: Optional[str] = Form(None),
     region_x: Optional[int] = Form(None),
@@ -292,9 +1008,53 @@ async def create_image_job(
     region_height: Optional[int] = Form(None),
     file_name: Optional[str] = Form(None),
     mime: Optional[str] = Form(None),
+    tiled: bool = Form(
+        False,
+        description="Split large images into overlapping model-sized tiles, "
+        "edit them concurrently and blend the seams.",
+    ),
+    timeout: Optional[float] = Form(
+        None,
+        description="Seconds the client will wait for the result, counted from "
+        "now. Defaults to job_timeout from the config.",
+    ),
+    deadline: Optional[float] = Form(
+        None, description="Absolute unix timestamp after which the result is useless."
+    ),
+    callback_url: Optional[str] = Form(
+        None,
+        description="URL that receives a signed POST once the job completes or "
+        "fails. Callbacks for the same URL are batched.",
+    ),
 ) -> JobStatus:
-    config = load_config()
-    if not image.content_type or not image.content_type.startswith("image/"):
+    trace = JobTrace()
+    config = await asyncio.to_thread(load_config)
+    if timeout is not None and timeout <= 0:
+        raise HTTPException(status_code=400, detail="Timeout must be positive")
+    job_deadline = Deadline.from_request(timeout, deadline, config.job_timeout)
+    if job_deadline is not None and job_deadline.expired():
+        raise HTTPException(status_code=400, detail="Deadline already passed")
+    callback = await _callback_url(callback_url, config)
+    source_record = None
+    sources = [image is not None, bool(source_job_id), bool(image_blob)]
+    if sum(sources) > 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide only one of image, source_job_id or image_blob",
+        )
+    if source_job_id:
+        source_record = store.get(source_job_id)
+        if source_record is None:
+            raise HTTPException(status_code=404, detail="Source job not found")
+        if source_record.result_bytes is None or not (
+            source_record.result_mime or ""
+        ).startswith("image/"):
+            raise HTTPException(status_code=409, detail="Source job has no image result")
+    elif image is None and not image_blob:
+        raise HTTPException(status_code=400, detail="Missing image")
+    elif image is not None and (
+        not image.content_type or not image.content_type.startswith("image/")
+    ):
         raise HTTPException(status_code=415, detail="Only image uploads are supported")
     if references:
         for ref in references:
@@ -304,6 +1064,8 @@ async def create_image_job(
                 )
     if (description is None) and (prompt is None):
         raise HTTPException(status_code=400, detail="Missing description")
+    if config.health_fail_fast and health.is_down():
+        raise HTTPException(status_code=503, detail=health.message)
     if any(
         value is not None
         for value in (region_x, region_y, region_width, region_height)
@@ -319,32 +1081,59 @@ async def create_image_job(
         raise HTTPException(status_code=400, detail="Region y must be >= 0")
 
     prompt_text = description or prompt or ""
-    prompt_text += _build_region_hint(region_x, region_y, region_width, region_height)
+    region = None
+    if region_x is not None:
+        region = (region_x, region_y, region_width, region_height)
     reference_images = []
+    upload_span = trace.start("upload_read")
+    blob_ids = [item for item in (reference_blobs or "").split(",") if item]
+    blob_raw = None
+    blob_mime = None
+    if image_blob or blob_ids:
+        blobs = _blob_store(config)
+        if image_blob:
+            blob_raw, info = await _read_blob(blobs, image_blob)
+            blob_mime = mime or info["mime"]
+            _require_image_mime(blob_mime)
+        for blob_id in blob_ids:
+            data, info = await _read_blob(blobs, blob_id)
+            _require_image_mime(info["mime"])
+            reference_images.append(data)
     if references:
         for ref in references:
             reference_images.append(await ref.read())
     total_images = 1 + len(reference_images)
-    model_name = config.nano_banana_model
-    if model_name.startswith("gemini-2.5-flash-image"):
-        model_limit = 3
-    elif model_name.startswith("gemini-3-pro-image"):
-        model_limit = 14
-    else:
-        model_limit = config.nano_banana_max_images
-    max_images = max(1, min(model_limit, config.nano_banana_max_images))
+    max_images = health.image_limit(config)
     if total_images > max_images:
         raise HTTPException(
             status_code=400,
             detail=f"Too many images: {total_images} > {max_images}",
         )
     job_id = uuid.uuid4().hex
-    record = store.create(job_id)
-    record.status = "queued"
+    record = store.create(job_id, trace)
     record.progress = 0
-    raw = await image.read()
-    selected_name = file_name or image.filename
-    selected_mime = mime or image.content_type
+    record.deadline = job_deadline
+    if blob_raw is not None:
+        raw = blob_raw
+        selected_name = file_name
+        selected_mime = blob_mime
+    elif source_record is not None:
+        raw = source_record.result_bytes
+        selected_name = file_name or source_record.result_name
+        selected_mime = mime or source_record.result_mime
+    else:
+        raw = await image.read()
+        selected_name = file_name or image.filename
+        selected_mime = mime or image.content_type
+    trace.finish(
+        upload_span,
+        size=len(raw) + sum(len(item) for item in reference_images),
+        source_job_id=source_job_id,
+        blobs=len(blob_ids) + (1 if image_blob else 0),
+    )
+    if callback is not None:
+        webhooks.watch(store, job_id, callback, config)
+    trace.start("queue_wait")
     background.add_task(
         run_image_job,
         job_id,
@@ -353,8 +1142,15 @@ async def create_image_job(
         reference_images,
         selected_name,
         selected_mime,
+        region,
+        tiled,
+    )
+    return JobStatus(
+        id=job_id,
+        status=record.status,
+        progress=record.progress,
+        deadline=job_deadline.wall_at if job_deadline is not None else None,
     )
-    return JobStatus(id=job_id, status=record.status, progress=record.progress)
 
 
 def _format_sse(data: dict) -> str:
@@ -373,7 +1169,12 @@ async def job_events(job_id: str) -> StreamingResponse:
             if event is None:
                 break
             yield _format_sse(event)
-            if event.get("type") in {"completed", "failed"}:
+            if event.get("type") in TERMINAL_EVENTS:
                 break
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.websocket("/api/ws")
+async def job_channel(websocket: WebSocket) -> None:
+    await JobChannel(websocket, store).serve()
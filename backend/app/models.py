@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -10,9 +10,68 @@ class JobStatus(BaseModel):
     status: str
     progress: int
     message: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
+    deadline: Optional[float] = None
 
 
 class JobResult(BaseModel):
     id: str
     file_name: Optional[str] = None
     mime: Optional[str] = None
+    patch_available: bool = False
+    delta_available: bool = False
+
+
+class TextPatchEdit(BaseModel):
+    start: int
+    end: int
+    byte_start: int
+    byte_end: int
+    replacement: str
+
+
+class TextPatch(BaseModel):
+    id: str
+    base_sha256: str
+    base_size: int
+    base_length: int
+    result_size: int
+    edits: List[TextPatchEdit]
+
+
+class ImagePatch(BaseModel):
+    x: int
+    y: int
+    width: int
+    height: int
+    data: str
+
+
+class ImageDelta(BaseModel):
+    id: str
+    base_sha256: str
+    width: int
+    height: int
+    changed_ratio: float
+    covered_ratio: float
+    patches: List[ImagePatch]
+
+
+class BlobInfo(BaseModel):
+    id: str
+    size: int
+    mime: Optional[str] = None
+
+
+class BlobUploadRequest(BaseModel):
+    sha256: str
+    size: int
+    mime: Optional[str] = None
+
+
+class BlobUploadStatus(BaseModel):
+    upload_id: str
+    size: int
+    chunk_size: int
+    missing: List[List[int]]
+    blob: Optional[BlobInfo] = None
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
 from io import BytesIO
 from typing import Optional
 from urllib.parse import urljoin
 
-from PIL import Image
-
 from .config import AppConfig
+from .text_patch import EditRangeError, TextEdit, apply_edits
+from .tracing import JobTrace, maybe_span
 
 
 def apply_edit(
@@ -17,18 +20,16 @@ def apply_edit(
 ) -> bytes:
     """
     Stub for non-image file edits.
-    Uses a simple byte-range replace to simulate modification.
+    Replaces one code-point range; see text_patch for multi-range streaming edits.
     """
+    sink = BytesIO()
     try:
-        text = content.decode("utf-8")
-    except UnicodeDecodeError:
-        return content
-
-    if region_start < 0 or region_end < region_start or region_end > len(text):
+        apply_edits(
+            BytesIO(content), [TextEdit(region_start, region_end, description)], sink
+        )
+    except (UnicodeDecodeError, EditRangeError):
         return content
-
-    updated = text[:region_start] + description + text[region_end:]
-    return updated.encode("utf-8")
+    return sink.getvalue()
 
 
 def _build_client(api_key: str, base_url: Optional[str], timeout: Optional[int]):
@@ -56,9 +57,80 @@ def _build_http_options(config: AppConfig) -> dict:
     client_args["trust_env"] = config.nano_banana_trust_env
     if client_args:
         options["client_args"] = client_args
+        options["async_client_args"] = dict(client_args)
     return options
 
 
+_clients: dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(config: AppConfig):
+    """
+    Shared genai.Client per upstream settings, so jobs reuse its HTTP
+    connection pool instead of opening a new one per call.
+    """
+    key = (
+        config.nano_banana_api_key,
+        config.nano_banana_base_url,
+        config.nano_banana_timeout,
+        config.nano_banana_proxy,
+        config.nano_banana_trust_env,
+    )
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            from google import genai
+
+            if len(_clients) >= 32:
+                _clients.clear()
+            client = genai.Client(
+                api_key=config.nano_banana_api_key,
+                http_options=_build_http_options(config),
+            )
+            _clients[key] = client
+        return client
+
+
+def _warm_client(config: AppConfig, timings: dict[str, float]):
+    """Blocking half of warm_up: SDK import and shared client construction."""
+    started = time.perf_counter()
+    from google import genai  # noqa: F401
+    from google.genai import types  # noqa: F401
+
+    timings["sdk_import"] = time.perf_counter() - started
+    if not config.nano_banana_api_key:
+        return None
+    started = time.perf_counter()
+    client = get_client(config)
+    timings["client"] = time.perf_counter() - started
+    return client
+
+
+async def warm_up(config: AppConfig) -> dict:
+    """
+    Import the SDK, build the shared client and open the connection pool of
+    its async client, which jobs use, with a one-item models listing.
+    Doubles as the startup connectivity check.
+    """
+    timings: dict[str, float] = {}
+    client = await asyncio.to_thread(_warm_client, config, timings)
+    if client is None:
+        return {
+            "status": "auth_failed",
+            "message": "鉴权失败：缺少 API Key",
+            "timings": timings,
+        }
+    started = time.perf_counter()
+    try:
+        await client.aio.models.list(config={"page_size": 1})
+        status, message = "ok", "连接正常"
+    except Exception as exc:  # pragma: no cover - network depends on env
+        status, message = classify_error(exc)
+    timings["probe"] = time.perf_counter() - started
+    return {"status": status, "message": message, "timings": timings}
+
+
 def _normalize_modalities(raw: str) -> list[str]:
     items = [item.strip().upper() for item in raw.split(",") if item.strip()]
     if "IMAGE" not in items:
@@ -75,6 +147,34 @@ def _normalize_aspect_ratio(value: Optional[str]) -> Optional[str]:
     return value
 
 
+_INLINE_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+
+
+def _sniff_image_mime(data: bytes) -> Optional[str]:
+    for signature, mime in _INLINE_IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _image_part(data: bytes, types):
+    # PNG/JPEG/WEBP go upstream as-is; handing the SDK a PIL image would make
+    # it decode and re-encode every input (slow for chained 4K results).
+    mime = _sniff_image_mime(data)
+    if mime is not None:
+        return types.Part.from_bytes(data=data, mime_type=mime)
+    from PIL import Image
+
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
 def _sanitize_detail(value):
     if isinstance(value, (str, int, float, bool)) or value is None:
         return value
@@ -121,8 +221,18 @@ def _iter_causes(exc: BaseException):
         current = current.__cause__ or current.__context__
 
 
+class UpstreamUnavailableError(RuntimeError):
+    """Raised instead of calling the upstream when it is known to be unusable."""
+
+    def __init__(self, kind: str, message: str) -> None:
+        super().__init__(message)
+        self.kind = kind
+
+
 def classify_error(exc: BaseException) -> tuple[str, str]:
     for item in _iter_causes(exc):
+        if isinstance(item, UpstreamUnavailableError):
+            return item.kind, str(item)
         name = item.__class__.__name__
         if isinstance(item, ValueError) and "NANO_BANANA_API_KEY" in str(item):
             return "auth_failed", "鉴权失败：缺少 API Key"
@@ -189,24 +299,22 @@ def check_connectivity(config: AppConfig) -> dict:
     return {"status": "ok", "message": "连接正常"}
 
 
-def edit_image(
+def _prepare_request(
     image_bytes: bytes,
     prompt: str,
     config: AppConfig,
-    reference_images: Optional[list[bytes]] = None,
-) -> bytes:
-    if not config.nano_banana_api_key:
-        raise ValueError("Missing NANO_BANANA_API_KEY")
-
-    http_options = _build_http_options(config)
-    from google import genai
-    client = genai.Client(api_key=config.nano_banana_api_key, http_options=http_options)
-    image = Image.open(BytesIO(image_bytes))
-    reference_images = reference_images or []
-    reference_pil = [Image.open(BytesIO(item)) for item in reference_images]
-
+    reference_images: list[bytes],
+    trace: Optional[JobTrace],
+    timeout: Optional[float],
+):
+    """Client, contents and generation config; blocking (SDK import, decode)."""
     from google.genai import types
 
+    client = get_client(config)
+    with maybe_span(trace, "decode", images=1 + len(reference_images)):
+        image = _image_part(image_bytes, types)
+        reference_parts = [_image_part(item, types) for item in reference_images]
+
     response_modalities = _normalize_modalities(
         config.nano_banana_response_modalities
     )
@@ -229,31 +337,65 @@ def edit_image(
         config_kwargs["image_config"] = types.ImageConfig(**image_config)
     if tools:
         config_kwargs["tools"] = tools
-
-    contents = [prompt, image, *reference_pil]
-    if config_kwargs:
-        response = client.models.generate_content(
-            model=config.nano_banana_model,
-            contents=contents,
-            config=types.GenerateContentConfig(**config_kwargs),
+    if timeout:
+        # Per-request override of the client-wide nano_banana_timeout.
+        config_kwargs["http_options"] = types.HttpOptions(
+            timeout=max(1, int(timeout * 1000))
         )
-    else:
-        response = client.models.generate_content(
+    generation_config = (
+        types.GenerateContentConfig(**config_kwargs) if config_kwargs else None
+    )
+    return client, [prompt, image, *reference_parts], generation_config
+
+
+def _encode_output(part) -> bytes:
+    output = part.as_image()
+    buffer = BytesIO()
+    try:
+        output.save(buffer, format="PNG")
+    except TypeError:
+        output.save(buffer)
+    return buffer.getvalue()
+
+
+async def edit_image(
+    image_bytes: bytes,
+    prompt: str,
+    config: AppConfig,
+    reference_images: Optional[list[bytes]] = None,
+    trace: Optional[JobTrace] = None,
+    timeout: Optional[float] = None,
+) -> bytes:
+    """
+    The request goes through the SDK's async client, so cancelling the
+    awaiting task (a lost hedge, an expired deadline) aborts the HTTP
+    request instead of leaving it running in a worker thread.
+    """
+    if not config.nano_banana_api_key:
+        raise ValueError("Missing NANO_BANANA_API_KEY")
+
+    client, contents, generation_config = await asyncio.to_thread(
+        _prepare_request,
+        image_bytes,
+        prompt,
+        config,
+        reference_images or [],
+        trace,
+        timeout,
+    )
+    with maybe_span(trace, "upstream", model=config.nano_banana_model):
+        response = await client.aio.models.generate_content(
             model=config.nano_banana_model,
             contents=contents,
+            config=generation_config,
         )
 
-    for part in response.parts:
-        if part.inline_data is not None:
-            data = getattr(part.inline_data, "data", None)
-            if data:
-                return bytes(data)
-            output = part.as_image()
-            buffer = BytesIO()
-            try:
-                output.save(buffer, format="PNG")
-            except TypeError:
-                output.save(buffer)
-            return buffer.getvalue()
+    with maybe_span(trace, "encode"):
+        for part in response.parts or []:
+            if part.inline_data is not None:
+                data = getattr(part.inline_data, "data", None)
+                if data:
+                    return bytes(data)
+                return await asyncio.to_thread(_encode_output, part)
 
     raise RuntimeError("No image returned from nano banana")
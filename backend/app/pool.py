@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import replace
+from typing import Any, Dict, Optional
+
+from .config import AppConfig
+from .nano_banana import UpstreamUnavailableError, warm_up
+
+logger = logging.getLogger("uvicorn.error")
+
+# classify_error kinds that take a member out of rotation for a while; the
+# call is retried on another member.
+FAILOVER_KINDS = frozenset({"rate_limited", "auth_failed"})
+# Kinds retried on another member. A timeout or connection failure may be
+# specific to one member's endpoint, but it does not cool the member down.
+RETRY_KINDS = FAILOVER_KINDS | {"network_unreachable"}
+# api_key_env may only name these variables; pool entries can be changed
+# through POST /api/config, which must not be able to read arbitrary env vars.
+KEY_ENV_PREFIX = "NANO_BANANA_API_KEY"
+_warned_inline_keys: set[str] = set()
+_warned_key_envs: set[str] = set()
+
+
+def _mask(key: Optional[str]) -> Optional[str]:
+    if not key:
+        return None
+    return f"...{key[-4:]}"
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` tokens per minute; 0 means unlimited."""
+
+    def __init__(self, rate_per_minute: int) -> None:
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def ready_in(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self._refill()
+            self.tokens -= 1
+
+
+class PoolMember:
+    def __init__(
+        self,
+        name: str,
+        config: AppConfig,
+        weight: float,
+        concurrency: int,
+        rate_per_minute: int,
+    ) -> None:
+        self.name = name
+        self.config = config
+        self.weight = max(weight, 0.01)
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate_per_minute)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.cooldown_kind: Optional[str] = None
+        self.requests = 0
+        self.successes = 0
+        self.failures: Dict[str, int] = {}
+        self.latency_ms: Optional[float] = None
+
+    @property
+    def identity(self) -> tuple:
+        return (
+            self.name,
+            self.config.nano_banana_api_key,
+            self.config.nano_banana_base_url,
+        )
+
+    def cooldown_in(self) -> float:
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def ready_in(self) -> Optional[float]:
+        """Seconds until this member can take a call; None while it is full."""
+        if self.concurrency > 0 and self.in_flight >= self.concurrency:
+            return None
+        return max(self.cooldown_in(), self.bucket.ready_in())
+
+    def load(self) -> float:
+        return (self.in_flight + 1) / self.weight
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "key": _mask(self.config.nano_banana_api_key),
+            "base_url": self.config.nano_banana_base_url,
+            "weight": self.weight,
+            "concurrency": self.concurrency,
+            "rate_per_minute": round(self.bucket.rate * 60),
+            "in_flight": self.in_flight,
+            "cooldown_s": round(self.cooldown_in(), 1),
+            "cooldown_kind": self.cooldown_kind if self.cooldown_in() > 0 else None,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": dict(self.failures),
+            "latency_ms": self.latency_ms,
+        }
+
+
+def _member_specs(config: AppConfig) -> list[Dict[str, Any]]:
+    if config.nano_banana_pool:
+        specs = []
+        for item in config.nano_banana_pool:
+            if not isinstance(item, dict):
+                continue
+            spec = dict(item)
+            name = str(spec.get("name"))
+            if spec.pop("api_key", None) is not None and name not in _warned_inline_keys:
+                _warned_inline_keys.add(name)
+                logger.warning(
+                    "Ignoring inline api_key in pool member %s; use api_key_env",
+                    name,
+                )
+            specs.append(spec)
+        return specs
+    keys = config.nano_banana_api_keys or [config.nano_banana_api_key]
+    return [{"api_key": key} for key in keys]
+
+
+def build_members(config: AppConfig) -> list[PoolMember]:
+    """
+    Members come from nano_banana_pool entries when configured, otherwise one
+    per key in NANO_BANANA_API_KEYS (or the single NANO_BANANA_API_KEY).
+    Pool entries name their key through api_key_env so keys stay out of app.yaml;
+    only NANO_BANANA_API_KEY* variables are read.
+    """
+    members = []
+    for index, spec in enumerate(_member_specs(config)):
+        key = spec.get("api_key")
+        env_name = str(spec.get("api_key_env") or "")
+        if env_name.startswith(KEY_ENV_PREFIX):
+            key = os.getenv(env_name)
+        elif env_name:
+            key = None
+            if env_name not in _warned_key_envs:
+                _warned_key_envs.add(env_name)
+                logger.warning(
+                    "Ignoring api_key_env %s: only %s* variables are allowed",
+                    env_name,
+                    KEY_ENV_PREFIX,
+                )
+        elif key is None:
+            key = config.nano_banana_api_key
+        member_config = replace(
+            config,
+            nano_banana_api_key=key,
+            nano_banana_base_url=spec.get("base_url") or config.nano_banana_base_url,
+        )
+        members.append(
+            PoolMember(
+                name=str(spec.get("name") or f"member-{index}"),
+                config=member_config,
+                weight=float(spec.get("weight", 1)),
+                concurrency=int(
+                    spec.get("concurrency", config.pool_member_concurrency)
+                ),
+                rate_per_minute=int(
+                    spec.get("rate_per_minute", config.pool_member_rate_per_minute)
+                ),
+            )
+        )
+    return members
+
+
+async def warm_up_members(config: AppConfig) -> dict:
+    """
+    warm_up against each pool member in turn until one answers, so a pool
+    configured only through NANO_BANANA_API_KEYS still passes the check.
+    """
+    result: dict = {"status": "auth_failed", "message": "鉴权失败：缺少 API Key"}
+    for member in build_members(config):
+        result = await warm_up(member.config)
+        if result.get("status") == "ok":
+            break
+    return result
+
+
+class UpstreamPool:
+    """
+    Routes upstream calls to the least-loaded member (in-flight calls over
+    weight) that has a free slot, a rate-limit token and is not cooling down.
+    """
+
+    def __init__(self) -> None:
+        self.members: list[PoolMember] = []
+        self._released = asyncio.Event()
+
+    def sync(self, config: AppConfig) -> None:
+        """Rebuild members from config, keeping state for unchanged ones."""
+        existing = {member.identity: member for member in self.members}
+        members = []
+        for fresh in build_members(config):
+            member = existing.get(fresh.identity)
+            if member is None:
+                member = fresh
+            else:
+                member.config = fresh.config
+                member.weight = fresh.weight
+                member.concurrency = fresh.concurrency
+                if round(member.bucket.rate * 60) != round(fresh.bucket.rate * 60):
+                    member.bucket = fresh.bucket
+            members.append(member)
+        self.members = members
+
+    def _pick(self, exclude: set[str]) -> tuple[Optional[PoolMember], Optional[float]]:
+        best = None
+        wait = None
+        for member in self.members:
+            if member.name in exclude:
+                continue
+            ready_in = member.ready_in()
+            if ready_in is None:
+                continue
+            if ready_in > 0:
+                wait = ready_in if wait is None else min(wait, ready_in)
+                continue
+            if best is None or member.load() < best.load():
+                best = member
+        return best, wait
+
+    async def acquire(self, timeout: float, exclude: set[str]) -> PoolMember:
+        deadline = time.monotonic() + timeout
+        while True:
+            member, wait = self._pick(exclude)
+            if member is not None:
+                member.bucket.take()
+                member.in_flight += 1
+                member.requests += 1
+                return member
+            candidates = [m for m in self.members if m.name not in exclude]
+            if not candidates or all(
+                m.cooldown_kind == "auth_failed" and m.cooldown_in() > 0
+                for m in candidates
+            ):
+                raise UpstreamUnavailableError(
+                    "auth_failed", "鉴权失败：没有可用的 API Key"
+                )
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise UpstreamUnavailableError(
+                    "rate_limited", "上游成员均繁忙或限流中：请稍后重试"
+                )
+            released = self._released
+            try:
+                await asyncio.wait_for(
+                    released.wait(), timeout=max(min(remaining, wait or remaining), 0.01)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def release(
+        self,
+        member: PoolMember,
+        kind: Optional[str],
+        elapsed: float,
+        config: AppConfig,
+    ) -> None:
+        member.in_flight -= 1
+        if kind is None:
+            member.successes += 1
+            latency = elapsed * 1000
+            member.latency_ms = round(
+                latency
+                if member.latency_ms is None
+                else member.latency_ms * 0.8 + latency * 0.2,
+                1,
+            )
+        else:
+            member.failures[kind] = member.failures.get(kind, 0) + 1
+        if kind in FAILOVER_KINDS:
+            cooldown = (
+                config.pool_auth_cooldown
+                if kind == "auth_failed"
+                else config.pool_rate_limit_cooldown
+            )
+            member.cooldown_until = time.monotonic() + cooldown
+            member.cooldown_kind = kind
+            logger.warning(
+                "Upstream member %s cooling down for %ss (%s)",
+                member.name,
+                cooldown,
+                kind,
+            )
+        self._released.set()
+        self._released = asyncio.Event()
+
+    def snapshot(self) -> list[dict]:
+        return [member.snapshot() for member in self.members]
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class StartupTimer:
+    """Wall-clock phases of process startup, relative to the first app import."""
+
+    def __init__(self, origin: Optional[float] = None) -> None:
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = time.perf_counter() - self.origin
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "phases_ms": {
+                name: round(value * 1000, 1) for name, value in self.phases.items()
+            },
+            "marks_ms": {
+                name: round(value * 1000, 1) for name, value in self.marks.items()
+            },
+        }
@@ -1,41 +1,145 @@
 from __future__ import annotations
 
 import asyncio
+import time
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, Optional, Set
 
+from .deadline import Deadline
+from .tracing import JobTrace
 
-@dataclass
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    VALIDATING = "validating"
+    UPLOADING = "uploading"
+    PROCESSING = "processing"
+    FINALIZING = "finalizing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+TERMINAL_EVENTS = frozenset({"completed", "failed"})
+
+JobListener = Callable[[str, dict], None]
+
+
+@dataclass(slots=True)
 class JobRecord:
-    status: str = "queued"
+    status: JobState = JobState.QUEUED
     progress: int = 0
     message: Optional[str] = None
     result_bytes: Optional[bytes] = None
+    result_path: Optional[str] = None
     result_name: Optional[str] = None
     result_mime: Optional[str] = None
-    events: asyncio.Queue = field(default_factory=asyncio.Queue)
+    result_patch: Optional[dict] = None
+    result_delta: Optional[dict] = None
+    result_mask: Optional[bytes] = None
+    delta_base: Optional[bytes] = None
+    events: Optional[asyncio.Queue] = None
+    trace: JobTrace = field(default_factory=JobTrace)
+    deadline: Optional[Deadline] = None
+    final_event: Optional[dict] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def has_result(self) -> bool:
+        return self.result_bytes is not None or self.result_path is not None
+
+    def snapshot(self, job_id: str, timings: bool = False) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "id": job_id,
+            "status": self.status.value,
+            "progress": self.progress,
+            "message": self.message,
+        }
+        if self.deadline is not None:
+            data["deadline"] = self.deadline.wall_at
+        if timings:
+            data["timings"] = self.trace.to_dict()
+        return data
 
 
 class JobStore:
+    """
+    In-memory job records. An event queue only exists while an SSE reader
+    waits on it, created by next_event and dropped once the terminal event
+    has been read; later subscribers get the terminal event replayed instead. Listeners (WebSocket channels) receive
+    every event as well, without consuming the queue. Finished records are
+    dropped after job_ttl by evict_finished.
+    """
+
     def __init__(self) -> None:
         self._jobs: Dict[str, JobRecord] = {}
+        self._listeners: Dict[str, Set[JobListener]] = {}
 
-    def create(self, job_id: str) -> JobRecord:
-        record = JobRecord()
+    def add_listener(self, job_id: str, listener: JobListener) -> None:
+        self._listeners.setdefault(job_id, set()).add(listener)
+
+    def remove_listener(self, job_id: str, listener: JobListener) -> None:
+        listeners = self._listeners.get(job_id)
+        if listeners is None:
+            return
+        listeners.discard(listener)
+        if not listeners:
+            del self._listeners[job_id]
+
+    def create(self, job_id: str, trace: Optional[JobTrace] = None) -> JobRecord:
+        record = JobRecord(trace=trace) if trace is not None else JobRecord()
         self._jobs[job_id] = record
         return record
 
     def get(self, job_id: str) -> Optional[JobRecord]:
         return self._jobs.get(job_id)
 
+    def evict_finished(self, max_age: float) -> list[JobRecord]:
+        """Drop records that finished at least `max_age` seconds ago."""
+        cutoff = time.monotonic() - max_age
+        expired = [
+            job_id
+            for job_id, record in self._jobs.items()
+            if record.finished_at is not None and record.finished_at <= cutoff
+        ]
+        evicted = []
+        for job_id in expired:
+            evicted.append(self._jobs.pop(job_id))
+            self._listeners.pop(job_id, None)
+        return evicted
+
+    def get_many(self, job_ids: Iterable[str]) -> Dict[str, JobRecord]:
+        found = {}
+        for job_id in job_ids:
+            record = self._jobs.get(job_id)
+            if record is not None:
+                found[job_id] = record
+        return found
+
     async def push_event(self, job_id: str, event: dict) -> None:
         record = self._jobs.get(job_id)
         if record is None:
             return
-        await record.events.put(event)
+        if event.get("type") in TERMINAL_EVENTS:
+            record.final_event = event
+            record.finished_at = time.monotonic()
+        for listener in list(self._listeners.get(job_id, ())):
+            listener(job_id, event)
+        if record.events is not None:
+            await record.events.put(event)
 
     async def next_event(self, job_id: str) -> Optional[dict]:
         record = self._jobs.get(job_id)
         if record is None:
             return None
-        return await record.events.get()
+        if record.events is None:
+            if record.final_event is not None:
+                return record.final_event
+            record.events = asyncio.Queue()
+        event = await record.events.get()
+        if event.get("type") in TERMINAL_EVENTS and record.events.empty():
+            record.events = None
+        return event
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import codecs
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterable, Optional
+
+CHUNK_SIZE = 1 << 20
+DEFAULT_STRIDE = 4096
+
+
+@dataclass
+class OffsetIndex:
+    """
+    Sparse code-point -> byte-offset map of a UTF-8 file.
+    checkpoints[k] is the byte offset of code point k * stride, so the index
+    costs 8 bytes per stride characters and a lookup reads at most
+    4 * stride bytes.
+    """
+
+    stride: int
+    checkpoints: array
+    total_chars: int
+    total_bytes: int
+
+    def byte_offset(self, source: BinaryIO, position: int) -> int:
+        if position < 0 or position > self.total_chars:
+            raise ValueError(f"Position out of range: {position}")
+        if position == self.total_chars:
+            return self.total_bytes
+        slot, remainder = divmod(position, self.stride)
+        base = self.checkpoints[slot]
+        if remainder == 0:
+            return base
+        source.seek(base)
+        data = source.read(remainder * 4)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        text = decoder.decode(data, final=False)
+        return base + len(text[:remainder].encode("utf-8"))
+
+    def resolve(self, source: BinaryIO, positions: Iterable[int]) -> Dict[int, int]:
+        return {value: self.byte_offset(source, value) for value in set(positions)}
+
+
+def build_index(source: BinaryIO, stride: int = DEFAULT_STRIDE) -> OffsetIndex:
+    """
+    Build the index in one streamed pass; raises UnicodeDecodeError if the
+    input is not valid UTF-8.
+    """
+    checkpoints = array("Q")
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chars = 0
+    read_bytes = 0
+    consumed = 0
+    source.seek(0)
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        final = not chunk
+        text = decoder.decode(chunk, final=final)
+        read_bytes += len(chunk)
+        next_checkpoint = len(checkpoints) * stride
+        cursor_char = chars
+        cursor_byte = consumed
+        while next_checkpoint < chars + len(text):
+            cursor_byte += len(
+                text[cursor_char - chars:next_checkpoint - chars].encode("utf-8")
+            )
+            cursor_char = next_checkpoint
+            checkpoints.append(cursor_byte)
+            next_checkpoint += stride
+        chars += len(text)
+        consumed = read_bytes - len(decoder.getstate()[0])
+        if final:
+            break
+    return OffsetIndex(
+        stride=stride,
+        checkpoints=checkpoints,
+        total_chars=chars,
+        total_bytes=read_bytes,
+    )
+
+
+class IndexCache:
+    """LRU of offset indexes keyed by content hash; safe across worker threads."""
+
+    def __init__(self, max_entries: int = 128) -> None:
+        self.max_entries = max_entries
+        self._items: OrderedDict[str, OffsetIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[OffsetIndex]:
+        with self._lock:
+            index = self._items.get(digest)
+            if index is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(digest)
+            return index
+
+    def put(self, digest: str, index: OffsetIndex) -> None:
+        with self._lock:
+            self._items[digest] = index
+            self._items.move_to_end(digest)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
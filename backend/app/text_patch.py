@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterable, Optional
+
+from .text_index import CHUNK_SIZE, OffsetIndex, build_index
+
+
+class EditRangeError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class TextEdit:
+    start: int
+    end: int
+    replacement: str
+
+
+def normalize_edits(edits: Iterable[TextEdit]) -> list[TextEdit]:
+    """
+    Sort edits by position and reject negative, inverted or overlapping
+    ranges. Inserts at the same position keep their submitted order.
+    """
+    ordered = sorted(edits, key=lambda item: (item.start, item.end))
+    previous_end = 0
+    for item in ordered:
+        if item.start < 0 or item.end < item.start:
+            raise EditRangeError(f"Invalid region range: {item.start}-{item.end}")
+        if item.start < previous_end:
+            raise EditRangeError(f"Overlapping regions at {item.start}")
+        previous_end = item.end
+    return ordered
+
+
+def copy_range(
+    source: BinaryIO,
+    start: int,
+    end: Optional[int],
+    sink: BinaryIO,
+) -> None:
+    source.seek(start)
+    remaining = None if end is None else end - start
+    while remaining is None or remaining > 0:
+        size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+        chunk = source.read(size)
+        if not chunk:
+            break
+        sink.write(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+def plan_edits(
+    source: BinaryIO,
+    edits: Iterable[TextEdit],
+    index: Optional[OffsetIndex] = None,
+) -> tuple[list[TextEdit], Dict[int, int]]:
+    """
+    Validate edits against the source and resolve their byte offsets.
+    Builds the offset index when none is given.
+    """
+    ordered = normalize_edits(edits)
+    if index is None:
+        index = build_index(source)
+    for item in ordered:
+        if item.end > index.total_chars:
+            raise EditRangeError("Region exceeds file length")
+    positions = [value for item in ordered for value in (item.start, item.end)]
+    return ordered, index.resolve(source, positions)
+
+
+def apply_planned(
+    source: BinaryIO,
+    ordered: list[TextEdit],
+    offsets: Dict[int, int],
+    sink: BinaryIO,
+) -> None:
+    position = 0
+    for item in ordered:
+        copy_range(source, position, offsets[item.start], sink)
+        sink.write(item.replacement.encode("utf-8"))
+        position = offsets[item.end]
+    copy_range(source, position, None, sink)
+
+
+def patched_size(
+    source_size: int,
+    ordered: list[TextEdit],
+    offsets: Dict[int, int],
+) -> int:
+    size = source_size
+    for item in ordered:
+        size += len(item.replacement.encode("utf-8"))
+        size -= offsets[item.end] - offsets[item.start]
+    return size
+
+
+def apply_edits(source: BinaryIO, edits: Iterable[TextEdit], sink: BinaryIO) -> None:
+    ordered, offsets = plan_edits(source, edits)
+    apply_planned(source, ordered, offsets, sink)
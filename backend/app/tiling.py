@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Awaitable, Callable, Optional
+
+from PIL import Image, ImageChops
+
+from .config import AppConfig
+from .deadline import Deadline
+from .tracing import JobTrace, maybe_span
+from .upstream import CircuitCallback, call_edit
+
+IMAGE_SIZE_PIXELS = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+Region = tuple[int, int, int, int]
+
+
+@dataclass(frozen=True)
+class Tile:
+    index: int
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.right - self.left, self.bottom - self.top
+
+
+def tile_size_for(config: AppConfig) -> int:
+    if config.tile_size > 0:
+        return config.tile_size
+    return IMAGE_SIZE_PIXELS.get((config.nano_banana_image_size or "").upper(), 1024)
+
+
+def _axis_starts(length: int, tile: int, overlap: int) -> list[int]:
+    if length <= tile:
+        return [0]
+    step = max(1, tile - overlap)
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+
+def plan_tiles(width: int, height: int, tile: int, overlap: int) -> list[Tile]:
+    overlap = max(0, min(overlap, tile // 2))
+    tiles = []
+    for top in _axis_starts(height, tile, overlap):
+        for left in _axis_starts(width, tile, overlap):
+            tiles.append(
+                Tile(
+                    index=len(tiles),
+                    left=left,
+                    top=top,
+                    right=min(width, left + tile),
+                    bottom=min(height, top + tile),
+                )
+            )
+    return tiles
+
+
+def tile_region(tile: Tile, region: Optional[Region]) -> Optional[Region]:
+    """Intersection of an (x, y, width, height) region with the tile, in tile coordinates."""
+    if region is None:
+        return 0, 0, tile.size[0], tile.size[1]
+    x, y, width, height = region
+    left = max(tile.left, x)
+    top = max(tile.top, y)
+    right = min(tile.right, x + width)
+    bottom = min(tile.bottom, y + height)
+    if right <= left or bottom <= top:
+        return None
+    return left - tile.left, top - tile.top, right - left, bottom - top
+
+
+def _ramp(length: int, size: tuple[int, int], horizontal: bool) -> Image.Image:
+    values = bytes(int(255 * (i + 1) / (length + 1)) for i in range(length))
+    if horizontal:
+        strip = Image.frombytes("L", (length, 1), values)
+        return strip.resize((length, size[1]))
+    strip = Image.frombytes("L", (1, length), values)
+    return strip.resize((size[0], length))
+
+
+def feather_mask(tile: Tile, overlap: int) -> Image.Image:
+    """
+    Tiles are pasted in raster order, so only the left and top edges overlap
+    already-pasted pixels; ramping those edges cross-fades the seam.
+    """
+    size = tile.size
+    mask = Image.new("L", size, 255)
+    if tile.left > 0 and overlap > 0:
+        ramp = min(overlap, size[0])
+        band = Image.new("L", size, 255)
+        band.paste(_ramp(ramp, size, horizontal=True), (0, 0))
+        mask = ImageChops.multiply(mask, band)
+    if tile.top > 0 and overlap > 0:
+        ramp = min(overlap, size[1])
+        band = Image.new("L", size, 255)
+        band.paste(_ramp(ramp, size, horizontal=False), (0, 0))
+        mask = ImageChops.multiply(mask, band)
+    return mask
+
+
+def _encode_png(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _tile_prompt(prompt: str, tile: Tile, local: Region, whole: bool) -> str:
+    text = (
+        f"{prompt}\n\nThis image is one tile of a larger picture; keep its size, "
+        "framing and edges unchanged so it can be stitched back seamlessly."
+    )
+    if whole:
+        return text
+    x, y, width, height = local
+    return (
+        f"{text}\n\nOnly edit the rectangle region "
+        f"(x={x}, y={y}, width={width}, height={height}) "
+        "in pixels from the top-left corner. Keep all other areas unchanged."
+    )
+
+
+async def edit_tiled(
+    image_bytes: bytes,
+    prompt: str,
+    config: AppConfig,
+    reference_images: list[bytes],
+    region: Optional[Region] = None,
+    on_tile: Optional[Callable[[Tile, str, int, int], Awaitable[None]]] = None,
+    trace: Optional[JobTrace] = None,
+    on_circuit: Optional[CircuitCallback] = None,
+    deadline: Optional[Deadline] = None,
+) -> bytes:
+    """
+    Split the image into overlapping tiles no larger than the model's output
+    size, edit tiles concurrently (bounded by tile_concurrency), and feather
+    the results back together. Tiles outside the region are kept as-is.
+    """
+    tile = tile_size_for(config)
+    overlap = max(0, min(config.tile_overlap, tile // 2))
+    with maybe_span(trace, "tile_split"):
+        source = await asyncio.to_thread(_open_rgb, image_bytes)
+        tiles = plan_tiles(source.width, source.height, tile, overlap)
+    total = len(tiles)
+    done = 0
+    semaphore = asyncio.Semaphore(max(1, config.tile_concurrency))
+    edited: dict[int, Image.Image] = {}
+
+    async def _report(item: Tile, status: str) -> None:
+        nonlocal done
+        done += 1
+        if on_tile is not None:
+            await on_tile(item, status, done, total)
+
+    async def _edit(item: Tile) -> None:
+        local = tile_region(item, region)
+        if local is None:
+            await _report(item, "skipped")
+            return
+        whole = region is None or local == (0, 0, item.size[0], item.size[1])
+        async with semaphore:
+            with maybe_span(trace, "tile", index=item.index):
+                crop = source.crop((item.left, item.top, item.right, item.bottom))
+                data = await asyncio.to_thread(_encode_png, crop)
+                result = await call_edit(
+                    data,
+                    _tile_prompt(prompt, item, local, whole),
+                    config,
+                    reference_images,
+                    on_circuit=on_circuit,
+                    deadline=deadline,
+                )
+                edited[item.index] = await asyncio.to_thread(
+                    _fit_tile, result, item.size
+                )
+        await _report(item, "completed")
+
+    tasks = [asyncio.create_task(_edit(item)) for item in tiles]
+    finished, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in finished:
+        if task.exception() is not None:
+            raise task.exception()
+
+    with maybe_span(trace, "tile_blend", tiles=total):
+        return await asyncio.to_thread(_blend, source, tiles, edited, overlap)
+
+
+def _open_rgb(data: bytes) -> Image.Image:
+    image = Image.open(BytesIO(data))
+    image.load()
+    if image.mode not in {"RGB", "RGBA"}:
+        image = image.convert("RGB")
+    return image
+
+
+def _fit_tile(data: bytes, size: tuple[int, int]) -> Image.Image:
+    image = Image.open(BytesIO(data))
+    image.load()
+    if image.size != size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    return image
+
+
+def _blend(
+    source: Image.Image,
+    tiles: list[Tile],
+    edited: dict[int, Image.Image],
+    overlap: int,
+) -> bytes:
+    canvas = source.copy()
+    for item in tiles:
+        patch = edited.get(item.index)
+        if patch is None:
+            continue
+        if patch.mode != canvas.mode:
+            patch = patch.convert(canvas.mode)
+        canvas.paste(patch, (item.left, item.top), feather_mask(item, overlap))
+    return _encode_png(canvas)
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class JobTrace:
+    """
+    Named timing spans for one job.
+    Offsets come from the monotonic clock; the wall-clock origin is only used
+    to anchor the spans when exporting them.
+    """
+
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    origin: float = field(default_factory=time.monotonic)
+    wall_origin: float = field(default_factory=time.time)
+    spans: list[Span] = field(default_factory=list)
+
+    def start(self, name: str, **attributes: Any) -> Span:
+        item = Span(name=name, start=time.monotonic(), attributes=attributes)
+        self.spans.append(item)
+        return item
+
+    def finish(self, item: Span, **attributes: Any) -> None:
+        if item.end is None:
+            item.end = time.monotonic()
+        item.attributes.update(attributes)
+
+    def end(self, name: str, **attributes: Any) -> None:
+        for item in reversed(self.spans):
+            if item.name == name and item.end is None:
+                self.finish(item, **attributes)
+                return
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        item = self.start(name, **attributes)
+        try:
+            yield item
+        except BaseException as exc:
+            item.attributes["error"] = exc.__class__.__name__
+            raise
+        finally:
+            self.finish(item)
+
+    def to_dict(self) -> dict:
+        now = time.monotonic()
+        spans = []
+        for item in self.spans:
+            end = item.end if item.end is not None else now
+            entry = {
+                "name": item.name,
+                "start_ms": _ms(item.start - self.origin),
+                "end_ms": _ms(end - self.origin),
+                "duration_ms": _ms(end - item.start),
+            }
+            if item.end is None:
+                entry["open"] = True
+            if item.attributes:
+                entry["attributes"] = dict(item.attributes)
+            spans.append(entry)
+        last = max((item.end or now for item in self.spans), default=self.origin)
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": _ms(last - self.origin),
+            "spans": spans,
+        }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def maybe_span(trace: Optional[JobTrace], name: str, **attributes: Any) -> ContextManager:
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, **attributes)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> list[dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+def _unix_nanos(trace: JobTrace, instant: float) -> str:
+    return str(int((trace.wall_origin + (instant - trace.origin)) * 1_000_000_000))
+
+
+def to_otlp(trace: JobTrace, root_name: str, attributes: Dict[str, Any]) -> dict:
+    now = time.monotonic()
+    root_id = os.urandom(8).hex()
+    end = max((item.end or now for item in trace.spans), default=trace.origin)
+    spans = [
+        {
+            "traceId": trace.trace_id,
+            "spanId": root_id,
+            "name": root_name,
+            "kind": 1,
+            "startTimeUnixNano": _unix_nanos(trace, trace.origin),
+            "endTimeUnixNano": _unix_nanos(trace, end),
+            "attributes": _otlp_attributes(attributes),
+        }
+    ]
+    for item in trace.spans:
+        spans.append(
+            {
+                "traceId": trace.trace_id,
+                "spanId": os.urandom(8).hex(),
+                "parentSpanId": root_id,
+                "name": item.name,
+                "kind": 1,
+                "startTimeUnixNano": _unix_nanos(trace, item.start),
+                "endTimeUnixNano": _unix_nanos(trace, item.end or now),
+                "attributes": _otlp_attributes(item.attributes),
+            }
+        )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": "tiny-craft"}),
+                },
+                "scopeSpans": [
+                    {"scope": {"name": "tiny-craft.jobs"}, "spans": spans},
+                ],
+            }
+        ]
+    }
+
+
+_export_client = None
+_export_tasks: set[asyncio.Task] = set()
+
+
+def _client():
+    global _export_client
+    if _export_client is None:
+        import httpx
+
+        _export_client = httpx.AsyncClient(
+            timeout=5,
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+        )
+    return _export_client
+
+
+async def export_trace(
+    url: str,
+    trace: JobTrace,
+    root_name: str,
+    attributes: Dict[str, Any],
+) -> None:
+    """
+    Send the trace to an OTLP/HTTP (JSON) collector, e.g.
+    http://127.0.0.1:4318/v1/traces, over a shared client. Failures are
+    only logged.
+    """
+    payload = to_otlp(trace, root_name, attributes)
+    try:
+        resp = await _client().post(url, json=payload)
+        if resp.status_code >= 400:
+            logger.warning("Trace export failed: HTTP %s", resp.status_code)
+    except Exception as exc:  # pragma: no cover - collector depends on env
+        logger.warning("Trace export failed: %s", exc)
+
+
+def schedule_export(
+    url: str,
+    trace: JobTrace,
+    root_name: str,
+    attributes: Dict[str, Any],
+) -> None:
+    """Export in the background, keeping the task referenced until it is done."""
+    task = asyncio.create_task(export_trace(url, trace, root_name, attributes))
+    _export_tasks.add(task)
+    task.add_done_callback(_export_tasks.discard)
+
+
+async def close_exporter(timeout: float = 5) -> None:
+    global _export_client
+    if _export_tasks:
+        await asyncio.wait(set(_export_tasks), timeout=timeout)
+    if _export_client is not None:
+        await _export_client.aclose()
+        _export_client = None
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from .circuit import CircuitBreaker
+from .config import AppConfig
+from .deadline import Deadline
+from .hedging import HedgeBudget, LatencyTracker
+from .nano_banana import UpstreamUnavailableError, classify_error, edit_image
+from .pool import RETRY_KINDS, UpstreamPool
+from .tracing import JobTrace, maybe_span
+
+breaker = CircuitBreaker()
+pool = UpstreamPool()
+latency = LatencyTracker()
+hedge_budget = HedgeBudget()
+
+CircuitCallback = Callable[[dict], Awaitable[None]]
+
+
+def _circuit_event(state: str) -> dict:
+    return {
+        "type": "circuit",
+        "state": state,
+        "retry_in": round(breaker.retry_in(), 1),
+    }
+
+
+async def _acquire(
+    config: AppConfig,
+    on_circuit: Optional[CircuitCallback],
+    trace: Optional[JobTrace],
+    deadline: Optional[Deadline],
+) -> None:
+    if breaker.try_acquire():
+        return
+    if config.circuit_mode != "park":
+        raise UpstreamUnavailableError("circuit_open", "上游熔断中：请稍后重试")
+    if on_circuit is not None:
+        await on_circuit(_circuit_event(breaker.state))
+    park_timeout = max(config.circuit_park_timeout, 0)
+    if deadline is not None:
+        park_timeout = deadline.cap(park_timeout)
+    with maybe_span(trace, "circuit_wait"):
+        allowed = await breaker.wait(park_timeout)
+    if not allowed:
+        if deadline is not None:
+            deadline.check("熔断等待")
+        raise UpstreamUnavailableError("circuit_open", "上游熔断中：等待恢复超时")
+    if on_circuit is not None:
+        await on_circuit(_circuit_event(breaker.state))
+
+
+def _outcome(call: asyncio.Future) -> Optional[str]:
+    if call.cancelled():
+        return "cancelled"
+    exc = call.exception()
+    return None if exc is None else classify_error(exc)[0]
+
+
+async def _attempt(
+    image_bytes: bytes,
+    prompt: str,
+    config: AppConfig,
+    reference_images: list[bytes],
+    trace: Optional[JobTrace],
+    tried: set[str],
+    deadline: Optional[Deadline] = None,
+) -> bytes:
+    """
+    One logical upstream call with member failover. Cancelling the attempt
+    aborts the in-flight request and releases its member slot right away.
+    """
+    while True:
+        wait = max(config.pool_wait_timeout, 0)
+        timeout = None
+        if deadline is not None:
+            deadline.check("上游排队")
+            wait = deadline.cap(wait)
+        try:
+            with maybe_span(trace, "pool_wait"):
+                member = await pool.acquire(wait, tried)
+        except UpstreamUnavailableError:
+            if deadline is not None:
+                deadline.check("上游调用")
+            raise
+        if deadline is not None:
+            deadline.check("上游调用")
+            # nano_banana_timeout = 0 means the client has no timeout.
+            timeout = deadline.cap(config.nano_banana_timeout or None)
+        tried.add(member.name)
+        started = time.monotonic()
+        call = asyncio.ensure_future(
+            edit_image(
+                image_bytes,
+                prompt,
+                member.config,
+                reference_images,
+                trace=trace,
+                timeout=timeout,
+            )
+        )
+
+        def _done(future: asyncio.Future, member=member, started=started) -> None:
+            kind = _outcome(future)
+            elapsed = time.monotonic() - started
+            if kind is None:
+                latency.record(elapsed)
+            pool.release(member, kind, elapsed, config)
+
+        call.add_done_callback(_done)
+        try:
+            # A slow upstream is cut off by the request timeout passed to the
+            # SDK, which raises a network error the pool, the breaker and the
+            # failover below all classify. wait_for only enforces the job
+            # deadline, covering time spent before the request is sent.
+            if deadline is None:
+                return await call
+            return await asyncio.wait_for(call, deadline.remaining())
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if deadline is not None and deadline.expired():
+                # Our own budget ran out; not an upstream failure.
+                raise UpstreamUnavailableError(
+                    "deadline_exceeded", "任务已超时：上游调用未在截止时间前完成"
+                ) from exc
+            kind = classify_error(exc)[0]
+            if kind in RETRY_KINDS and len(tried) < len(pool.members):
+                continue
+            raise
+
+
+async def _hedged(
+    image_bytes: bytes,
+    prompt: str,
+    config: AppConfig,
+    reference_images: list[bytes],
+    trace: Optional[JobTrace],
+    deadline: Optional[Deadline],
+) -> bytes:
+    """
+    Fire a second attempt when the first is slower than the configured
+    percentile of recent latencies, within the hedge budget. The first
+    success wins and the other attempt is cancelled.
+    """
+    hedge_budget.record_call()
+    tried: set[str] = set()
+    primary = asyncio.create_task(
+        _attempt(image_bytes, prompt, config, reference_images, trace, tried, deadline)
+    )
+    tasks = [primary]
+    try:
+        observed = latency.percentile(config.hedge_percentile)
+        delay = max(observed or 0.0, config.hedge_min_delay_ms / 1000)
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if (
+            done
+            or (deadline is not None and deadline.expired())
+            or not hedge_budget.try_hedge(config.hedge_budget_percent / 100)
+        ):
+            return await primary
+        exclude = set()
+        if config.hedge_other_member and len(tried) < len(pool.members):
+            exclude = set(tried)
+        hedge_span = None
+        if trace is not None:
+            hedge_span = trace.start("hedge", delay_ms=round(delay * 1000))
+        hedge = asyncio.create_task(
+            _attempt(
+                image_bytes, prompt, config, reference_images, trace, exclude, deadline
+            )
+        )
+        tasks.append(hedge)
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        hedge_budget.wins += 1
+                    if hedge_span is not None:
+                        trace.finish(hedge_span, won=task is hedge)
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_edit(
+    image_bytes: bytes,
+    prompt: str,
+    config: AppConfig,
+    reference_images: list[bytes],
+    trace: Optional[JobTrace] = None,
+    on_circuit: Optional[CircuitCallback] = None,
+    deadline: Optional[Deadline] = None,
+) -> bytes:
+    """
+    Run edit_image behind the circuit breaker, on the least-loaded pool
+    member, hedged when hedge_enabled is set. An open circuit fails the call
+    at once, or parks it until the breaker lets a call through when
+    circuit_mode is "park". Every wait and the upstream request itself are
+    bounded by the job deadline, if any.
+    """
+    breaker.configure(config.circuit_failure_threshold, config.circuit_reset_timeout)
+    pool.sync(config)
+    if deadline is not None:
+        deadline.check("上游调用")
+    await _acquire(config, on_circuit, trace, deadline)
+    try:
+        if config.hedge_enabled:
+            result = await _hedged(
+                image_bytes, prompt, config, reference_images, trace, deadline
+            )
+        else:
+            result = await _attempt(
+                image_bytes, prompt, config, reference_images, trace, set(), deadline
+            )
+    except asyncio.CancelledError:
+        breaker.record_failure("cancelled")
+        raise
+    except Exception as exc:
+        breaker.record_failure(classify_error(exc)[0])
+        raise
+    breaker.record_success()
+    return result
+
+
+def hedging_snapshot() -> dict:
+    data = hedge_budget.snapshot()
+    data["latency_samples"] = len(latency.samples)
+    for value in (50, 95, 99):
+        observed = latency.percentile(value)
+        data[f"latency_p{value}_ms"] = (
+            round(observed * 1000, 1) if observed is not None else None
+        )
+    return data
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class LoopWatchdog:
+    """
+    Measures event-loop lag with a sleeping sampler task and, from a separate
+    thread, logs the loop thread's stack whenever the sampler has not run for
+    longer than the threshold (i.e. something is blocking the loop).
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: deque[float] = deque(maxlen=1024)
+        self._samples = 0
+        self._max_lag = 0.0
+        self._stalls = 0
+        self._longest_stall = 0.0
+        self._last_stall: Optional[dict] = None
+        self._heartbeat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(
+            target=self._monitor, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 1.0)
+            self._thread = None
+
+    async def _sample(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            self._heartbeat = now
+            self._samples += 1
+            self._lags.append(lag)
+            if lag > self._max_lag:
+                self._max_lag = lag
+
+    def _monitor(self) -> None:
+        reported_for: Optional[float] = None
+        while not self._stopped.wait(self.interval / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled > self._longest_stall:
+                self._longest_stall = stalled
+            if stalled < self.threshold or reported_for == heartbeat:
+                continue
+            reported_for = heartbeat
+            self._stalls += 1
+            self._report(stalled)
+
+    def _report(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        task_name = None
+        coro_name = None
+        if self._loop is not None:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+                coro = task.get_coro()
+                coro_name = getattr(coro, "__qualname__", None) or repr(coro)
+        self._last_stall = {
+            "blocked_ms": round(stalled * 1000, 1),
+            "task": task_name,
+            "coroutine": coro_name,
+            "stack": stack,
+        }
+        logger.warning(
+            "Event loop blocked for %.0f ms (task=%s, coroutine=%s)\n%s",
+            stalled * 1000,
+            task_name,
+            coro_name,
+            stack,
+        )
+
+    def snapshot(self) -> dict:
+        lags = sorted(self._lags)
+        p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+        return {
+            "enabled": self.running,
+            "interval_ms": round(self.interval * 1000, 1),
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "samples": self._samples,
+            "lag_last_ms": round(self._lags[-1] * 1000, 3) if self._lags else 0.0,
+            "lag_mean_ms": round(sum(lags) / len(lags) * 1000, 3) if lags else 0.0,
+            "lag_p99_ms": round(p99 * 1000, 3),
+            "lag_max_ms": round(self._max_lag * 1000, 3),
+            "stalls": self._stalls,
+            "longest_stall_ms": round(max(0.0, self._longest_stall) * 1000, 1),
+            "last_stall": self._last_stall,
+        }
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import math
+import random
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from .config import AppConfig
+from .storage import TERMINAL_EVENTS, JobStore
+
+logger = logging.getLogger("uvicorn.error")
+
+SIGNATURE_HEADER = "X-TinyCraft-Signature"
+TIMESTAMP_HEADER = "X-TinyCraft-Timestamp"
+DELIVERY_HEADER = "X-TinyCraft-Delivery"
+MAX_PENDING = 10000
+MAX_BACKOFF = 60.0
+RETRY_STATUSES = frozenset({408, 425, 429})
+
+
+class WebhookError(ValueError):
+    pass
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """HMAC-SHA256 over "<timestamp>.<body>", hex encoded."""
+    message = timestamp.encode("ascii") + b"." + body
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify(
+    secret: str,
+    timestamp: str,
+    body: bytes,
+    signature: str,
+    tolerance: float = 300,
+) -> bool:
+    """Receiver-side check; rejects stale timestamps to limit replays."""
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        return False
+    if age > tolerance:
+        return False
+    expected = "sha256=" + sign(secret, timestamp, body)
+    return hmac.compare_digest(expected, signature)
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def validate_callback_url(url: str, config: AppConfig) -> str:
+    """
+    Blocking (resolves DNS). Hosts in webhook_allowed_hosts are trusted as
+    is; with an allowlist nothing else is accepted, without one the host
+    must resolve only to public addresses, so callbacks cannot be aimed at
+    loopback, private or link-local services such as cloud metadata.
+    """
+    if not config.webhook_secret:
+        raise WebhookError("Callbacks are disabled: webhook_secret is not configured")
+    parsed = urlparse(url)
+    if parsed.scheme not in {"http", "https"} or not parsed.hostname:
+        raise WebhookError("Callback URL must be an absolute http(s) URL")
+    host = parsed.hostname
+    allowed = config.webhook_allowed_hosts
+    if allowed:
+        if host not in allowed:
+            raise WebhookError(f"Callback host not allowed: {host}")
+        return url
+    try:
+        infos = socket.getaddrinfo(host, parsed.port or 0, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError):
+        raise WebhookError(f"Callback host does not resolve: {host}")
+    if not infos or not all(_is_public(info[4][0]) for info in infos):
+        raise WebhookError(f"Callback host is not a public address: {host}")
+    return url
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    """Retry-After in seconds; the HTTP-date form is not supported."""
+    try:
+        value = float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) and value >= 0 else None
+
+
+class WebhookDispatcher:
+    """
+    Delivers terminal job events to callback URLs. Events for the same URL
+    are collected for webhook_batch_window_ms and posted together as
+    {"events": [...]}, so a batch of jobs sharing a callback costs a handful
+    of requests. Failed posts are retried with exponential backoff; every
+    attempt of a batch carries the same delivery id so receivers can dedupe.
+    """
+
+    def __init__(self) -> None:
+        self._config = AppConfig()
+        self._pending: Dict[str, List[dict]] = {}
+        self._flushers: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self.queued = 0
+        self.delivered = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def watch(self, store: JobStore, job_id: str, url: str, config: AppConfig) -> None:
+        self._config = config
+
+        def _on_event(event_job_id: str, event: dict) -> None:
+            if event.get("type") not in TERMINAL_EVENTS:
+                return
+            store.remove_listener(job_id, _on_event)
+            record = store.get(job_id)
+            payload = {
+                "job": job_id,
+                "type": event["type"],
+                "status": record.status.value if record else event["type"],
+                "message": event.get("message"),
+                "kind": event.get("kind"),
+                "total_ms": (event.get("timings") or {}).get("total_ms"),
+                "finished_at": time.time(),
+            }
+            if event["type"] == "completed":
+                payload["result"] = f"/api/jobs/{job_id}/result"
+            self.enqueue(
+                url, {key: value for key, value in payload.items() if value is not None}
+            )
+
+        store.add_listener(job_id, _on_event)
+
+    def enqueue(self, url: str, payload: dict) -> None:
+        pending = self._pending.setdefault(url, [])
+        pending.append(payload)
+        self.queued += 1
+        if sum(len(items) for items in self._pending.values()) > MAX_PENDING:
+            pending.pop(0)
+            self.dropped += 1
+            logger.warning("Webhook backlog full, dropped oldest event for %s", url)
+        if url not in self._flushers:
+            self._flushers[url] = asyncio.create_task(self._flush(url))
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                trust_env=False,
+                follow_redirects=False,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+            )
+        return self._client
+
+    async def _flush(self, url: str) -> None:
+        try:
+            await asyncio.sleep(max(self._config.webhook_batch_window_ms, 0) / 1000)
+            size = max(self._config.webhook_batch_size, 1)
+            # Events arriving while a batch is in flight (or backing off) are
+            # picked up by the next pass instead of spawning another flusher.
+            while self._pending.get(url):
+                pending = self._pending[url]
+                batch, self._pending[url] = pending[:size], pending[size:]
+                try:
+                    await self._deliver(url, batch, self._config.webhook_max_attempts)
+                except asyncio.CancelledError:
+                    self._pending[url] = batch + self._pending.get(url, [])
+                    raise
+        finally:
+            self._flushers.pop(url, None)
+            if not self._pending.get(url):
+                self._pending.pop(url, None)
+
+    async def _deliver(self, url: str, events: List[dict], attempts: int) -> bool:
+        config = self._config
+        body = json.dumps(
+            {"events": events}, ensure_ascii=True, separators=(",", ":")
+        ).encode("utf-8")
+        delivery = uuid.uuid4().hex
+        delay = max(config.webhook_backoff_ms, 1) / 1000
+        error = ""
+        for attempt in range(1, max(attempts, 1) + 1):
+            timestamp = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/json",
+                "User-Agent": "tiny-craft-webhook",
+                DELIVERY_HEADER: delivery,
+                TIMESTAMP_HEADER: timestamp,
+                SIGNATURE_HEADER: "sha256="
+                + sign(config.webhook_secret or "", timestamp, body),
+            }
+            wait = None
+            try:
+                # Re-checked per attempt: the name may resolve elsewhere by now.
+                await asyncio.to_thread(validate_callback_url, url, config)
+                resp = await self._get_client().post(
+                    url, content=body, headers=headers, timeout=config.webhook_timeout
+                )
+            except WebhookError as exc:
+                error = str(exc)
+                retryable = False
+            except httpx.HTTPError as exc:
+                error = type(exc).__name__
+                retryable = True
+            else:
+                if resp.status_code < 300:
+                    self.delivered += len(events)
+                    self.batches += 1
+                    return True
+                error = f"HTTP {resp.status_code}"
+                retryable = resp.status_code in RETRY_STATUSES or resp.status_code >= 500
+                if resp.status_code == 429:
+                    wait = _retry_after(resp)
+            if not retryable or attempt >= attempts:
+                break
+            self.retries += 1
+            backoff = delay * random.uniform(0.5, 1.5)
+            if wait is not None:
+                # A receiver cannot hold the flusher for longer than MAX_BACKOFF.
+                backoff = min(max(wait, backoff), MAX_BACKOFF)
+            await asyncio.sleep(backoff)
+            delay = min(delay * 2, MAX_BACKOFF)
+        self.failed += len(events)
+        logger.warning(
+            "Webhook delivery failed: url=%s events=%s (%s)", url, len(events), error
+        )
+        return False
+
+    async def stop(self) -> None:
+        """Cancel pending windows and make one last attempt at what is queued."""
+        flushers = list(self._flushers.values())
+        for task in flushers:
+            task.cancel()
+        await asyncio.gather(*flushers, return_exceptions=True)
+        pending, self._pending = self._pending, {}
+        if pending:
+            await asyncio.wait(
+                [
+                    asyncio.create_task(self._deliver(url, events, 1))
+                    for url, events in pending.items()
+                ],
+                timeout=self._config.webhook_timeout,
+            )
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self.queued,
+            "pending": sum(len(items) for items in self._pending.values()),
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "enabled": bool(self._config.webhook_secret),
+        }
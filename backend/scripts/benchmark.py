@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def read_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def build_image(path: Optional[str], size: int) -> tuple[bytes, str, str]:
+    if path:
+        data = Path(path).read_bytes()
+        return data, Path(path).name, "image/png"
+    image = Image.frombytes("RGB", (size, size), os.urandom(size * size * 3))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue(), "bench.png", "image/png"
+
+
+async def run_one(
+    client: httpx.AsyncClient,
+    image: tuple[bytes, str, str],
+    prompt: str,
+) -> dict:
+    data, name, mime = image
+    started = time.monotonic()
+    resp = await client.post(
+        "/api/image/jobs",
+        files={"image": (name, data, mime)},
+        data={"description": prompt},
+    )
+    if resp.status_code != 200:
+        return {
+            "status": "rejected",
+            "kind": f"http_{resp.status_code}",
+            "latency": time.monotonic() - started,
+        }
+    job_id = resp.json()["id"]
+    submitted = time.monotonic()
+    final: dict = {"type": "disconnected"}
+    async with client.stream("GET", f"/api/jobs/{job_id}/events") as stream:
+        async for line in stream.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event.get("type") in {"completed", "failed"}:
+                final = event
+                break
+    return {
+        "status": final.get("type"),
+        "kind": final.get("kind"),
+        "submit_latency": submitted - started,
+        "latency": time.monotonic() - started,
+    }
+
+
+async def probe_loop(
+    base_url: str,
+    pid: Optional[int],
+    stop: asyncio.Event,
+    samples: dict,
+    interval: float,
+) -> None:
+    # Time a trivial endpoint: when the server loop is blocked the probe waits too.
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                await client.get("/", follow_redirects=False)
+                samples["probe"].append(time.monotonic() - started)
+            except httpx.HTTPError:
+                pass
+            if pid is not None:
+                rss = read_rss_mb(pid)
+                if rss is not None:
+                    samples["rss"].append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run_benchmark(args: argparse.Namespace, pid: Optional[int]) -> dict:
+    image = build_image(args.image, args.image_size)
+    limits = httpx.Limits(max_connections=args.concurrency * 2 + 4)
+    samples: dict = {"probe": [], "rss": []}
+    stop = asyncio.Event()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+
+        async def _bounded() -> dict:
+            async with semaphore:
+                try:
+                    return await run_one(client, image, args.prompt)
+                except httpx.HTTPError as exc:
+                    return {"status": "error", "kind": exc.__class__.__name__, "latency": None}
+
+        prober = asyncio.create_task(
+            probe_loop(args.url, pid, stop, samples, args.sample_interval)
+        )
+        started = time.monotonic()
+        results = await asyncio.gather(*[_bounded() for _ in range(args.jobs)])
+        elapsed = time.monotonic() - started
+        stop.set()
+        await prober
+        server_metrics = None
+        try:
+            resp = await client.get("/api/metrics")
+            if resp.status_code == 200:
+                server_metrics = resp.json()
+        except httpx.HTTPError:
+            pass
+
+    latencies = [item["latency"] for item in results if item["status"] == "completed"]
+    submits = [item["submit_latency"] for item in results if "submit_latency" in item]
+    outcomes: dict = {}
+    for item in results:
+        key = item["status"] if not item.get("kind") else f"{item['status']}:{item['kind']}"
+        outcomes[key] = outcomes.get(key, 0) + 1
+
+    def _summary(values: list[float]) -> dict:
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values) if values else None,
+        }
+
+    report = {
+        "jobs": args.jobs,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "throughput_jobs_s": len(latencies) / elapsed if elapsed else 0.0,
+        "outcomes": outcomes,
+        "latency_s": _summary(latencies),
+        "submit_latency_s": _summary(submits),
+        "loop_lag_probe_s": _summary(samples["probe"]),
+    }
+    if server_metrics:
+        report["server_metrics"] = server_metrics
+    if samples["rss"]:
+        report["rss_mb"] = {
+            "start": samples["rss"][0],
+            "peak": max(samples["rss"]),
+            "end": samples["rss"][-1],
+        }
+    return report
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server not ready: {url}")
+
+
+def spawn_servers(args: argparse.Namespace) -> tuple[list[subprocess.Popen], int]:
+    mock_cmd = [
+        sys.executable,
+        str(ROOT / "scripts" / "mock_upstream.py"),
+        "--port", str(args.mock_port),
+        "--latency", str(args.mock_latency),
+        "--jitter", str(args.mock_jitter),
+        "--tail-rate", str(args.mock_tail_rate),
+        "--tail-latency", str(args.mock_tail_latency),
+        "--rate-429", str(args.mock_rate_429),
+        "--rate-5xx", str(args.mock_rate_5xx),
+        "--width", str(args.mock_output_size),
+        "--height", str(args.mock_output_size),
+    ]
+    mock = subprocess.Popen(mock_cmd, cwd=ROOT)
+    _wait_ready(f"http://127.0.0.1:{args.mock_port}/mock/stats", timeout=120)
+
+    env = dict(os.environ)
+    env["NANO_BANANA_API_KEY"] = "mock-key"
+    env["NANO_BANANA_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}/"
+    env.setdefault("TINY_CRAFT_WATCHDOG", "1")
+    port = args.url.rsplit(":", 1)[-1].strip("/")
+    backend = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", port, "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    _wait_ready(args.url)
+    return [backend, mock], backend.pid
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Drive /api/image/jobs + SSE and report throughput/latency."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--jobs", type=int, default=50, help="Total jobs to submit")
+    parser.add_argument("--concurrency", type=int, default=10, help="Jobs in flight")
+    parser.add_argument("--image", default=None, help="Input image (default: generated)")
+    parser.add_argument("--image-size", type=int, default=512, help="Generated image edge")
+    parser.add_argument("--prompt", default="Make it brighter.")
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--sample-interval", type=float, default=0.25)
+    parser.add_argument("--server-pid", type=int, default=None, help="Sample RSS of this pid")
+    parser.add_argument("--spawn", action="store_true", help="Start mock upstream + backend")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--mock-latency", type=float, default=1.0)
+    parser.add_argument("--mock-jitter", type=float, default=0.2)
+    parser.add_argument("--mock-tail-rate", type=float, default=0.0)
+    parser.add_argument("--mock-tail-latency", type=float, default=30.0)
+    parser.add_argument("--mock-rate-429", type=float, default=0.0)
+    parser.add_argument("--mock-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--mock-output-size", type=int, default=1024)
+    parser.add_argument("--out", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    processes: list[subprocess.Popen] = []
+    pid = args.server_pid
+    try:
+        if args.spawn:
+            processes, pid = spawn_servers(args)
+        report = asyncio.run(run_benchmark(args, pid))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
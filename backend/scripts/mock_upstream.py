@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import random
+import time
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+IMAGE_MODELS = {
+    "gemini-2.5-flash-image": 3,
+    "gemini-3-pro-image-preview": 14,
+}
+
+
+@dataclass
+class MockSettings:
+    latency: float = 1.0
+    jitter: float = 0.2
+    tail_rate: float = 0.0
+    tail_latency: float = 30.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    width: int = 1024
+    height: int = 1024
+    seed: Optional[int] = None
+
+
+settings = MockSettings()
+_setting_types = {key: type(value) for key, value in asdict(settings).items()}
+_setting_types["seed"] = int
+stats = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "inflight": 0}
+_rng = random.Random()
+_payload_cache: dict[tuple[int, int], str] = {}
+
+app = FastAPI(title="tiny-craft mock upstream")
+
+
+def _render_png(width: int, height: int) -> str:
+    key = (width, height)
+    cached = _payload_cache.get(key)
+    if cached is not None:
+        return cached
+    # Noise does not compress, so the payload size matches a real photo.
+    image = Image.frombytes("RGB", (width, height), _rng.randbytes(width * height * 3))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    _payload_cache[key] = encoded
+    return encoded
+
+
+def _error(code: int, status: str, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=code,
+        content={"error": {"code": code, "message": message, "status": status}},
+    )
+
+
+def _pick_delay() -> float:
+    if settings.tail_rate and _rng.random() < settings.tail_rate:
+        return settings.tail_latency
+    delay = settings.latency + _rng.uniform(-settings.jitter, settings.jitter)
+    return max(0.0, delay)
+
+
+@app.get("/mock/stats")
+async def get_stats() -> dict:
+    return {"settings": asdict(settings), "stats": stats}
+
+
+@app.post("/mock/config")
+async def update_settings(payload: dict) -> dict:
+    for key, value in payload.items():
+        if hasattr(settings, key):
+            setattr(settings, key, _setting_types[key](value))
+    return asdict(settings)
+
+
+@app.get("/models")
+@app.get("/{version}/models")
+async def list_models(version: Optional[str] = None) -> dict:
+    return {
+        "models": [
+            {
+                "name": f"models/{name}",
+                "displayName": name,
+                "supportedGenerationMethods": ["generateContent"],
+                "maxInputImages": limit,
+            }
+            for name, limit in IMAGE_MODELS.items()
+        ]
+    }
+
+
+@app.post("/{path:path}")
+async def generate_content(path: str, request: Request) -> JSONResponse:
+    if not path.endswith(":generateContent"):
+        return _error(404, "NOT_FOUND", f"Unknown method: {path}")
+    await request.body()
+    stats["requests"] += 1
+    stats["inflight"] += 1
+    started = time.monotonic()
+    try:
+        await asyncio.sleep(_pick_delay())
+        roll = _rng.random()
+        if roll < settings.rate_429:
+            stats["429"] += 1
+            return _error(429, "RESOURCE_EXHAUSTED", "Mock quota exceeded")
+        if roll < settings.rate_429 + settings.rate_5xx:
+            stats["5xx"] += 1
+            return _error(503, "UNAVAILABLE", "Mock upstream unavailable")
+        data = await asyncio.to_thread(_render_png, settings.width, settings.height)
+        stats["ok"] += 1
+        return JSONResponse(
+            content={
+                "candidates": [
+                    {
+                        "content": {
+                            "role": "model",
+                            "parts": [
+                                {"inlineData": {"mimeType": "image/png", "data": data}}
+                            ],
+                        },
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }
+                ],
+                "usageMetadata": {"promptTokenCount": 0, "totalTokenCount": 0},
+                "modelVersion": path.split("/")[-1].split(":")[0],
+                "responseId": f"mock-{stats['requests']}",
+                "_mockElapsed": round(time.monotonic() - started, 3),
+            }
+        )
+    finally:
+        stats["inflight"] -= 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fake Gemini endpoint. Point NANO_BANANA_BASE_URL at it."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=settings.latency, help="Mean latency (s)")
+    parser.add_argument("--jitter", type=float, default=settings.jitter, help="Uniform jitter (s)")
+    parser.add_argument("--tail-rate", type=float, default=settings.tail_rate, help="Share of slow calls")
+    parser.add_argument("--tail-latency", type=float, default=settings.tail_latency, help="Latency of slow calls (s)")
+    parser.add_argument("--rate-429", type=float, default=settings.rate_429, help="Share of 429 responses")
+    parser.add_argument("--rate-5xx", type=float, default=settings.rate_5xx, help="Share of 503 responses")
+    parser.add_argument("--width", type=int, default=settings.width, help="Output image width")
+    parser.add_argument("--height", type=int, default=settings.height, help="Output image height")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    for key in asdict(settings):
+        setattr(settings, key, getattr(args, key))
+    if args.seed is not None:
+        _rng.seed(args.seed)
+    _render_png(settings.width, settings.height)
+
+    import uvicorn
+
+    print(f"Mock upstream: NANO_BANANA_BASE_URL=http://{args.host}:{args.port}/")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
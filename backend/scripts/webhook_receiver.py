@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.webhooks import DELIVERY_HEADER, SIGNATURE_HEADER, TIMESTAMP_HEADER, verify
+
+app = FastAPI(title="tiny-craft webhook receiver")
+secret: Optional[str] = None
+fail_rate = 0.0
+received: list[dict] = []
+stats = {"requests": 0, "events": 0, "rejected": 0, "failed": 0, "duplicates": 0}
+_deliveries: set[str] = set()
+
+
+@app.get("/received")
+async def get_received() -> dict:
+    return {"stats": stats, "events": received[-1000:]}
+
+
+@app.post("/received/reset")
+async def reset_received() -> dict:
+    received.clear()
+    _deliveries.clear()
+    for key in stats:
+        stats[key] = 0
+    return stats
+
+
+@app.post("/{path:path}")
+async def receive(path: str, request: Request) -> JSONResponse:
+    stats["requests"] += 1
+    body = await request.body()
+    if secret is not None:
+        signature = request.headers.get(SIGNATURE_HEADER, "")
+        timestamp = request.headers.get(TIMESTAMP_HEADER, "")
+        if not verify(secret, timestamp, body, signature):
+            stats["rejected"] += 1
+            return JSONResponse({"error": "bad signature"}, status_code=401)
+    if random.random() < fail_rate:
+        stats["failed"] += 1
+        return JSONResponse({"error": "injected failure"}, status_code=503)
+    delivery = request.headers.get(DELIVERY_HEADER, "")
+    if delivery in _deliveries:
+        stats["duplicates"] += 1
+        return JSONResponse({"ok": True, "duplicate": True})
+    _deliveries.add(delivery)
+    events = json.loads(body).get("events", [])
+    stats["events"] += len(events)
+    for event in events:
+        received.append({"path": "/" + path, "received_at": time.time(), **event})
+        print(f"[{event.get('type')}] job={event.get('job')} {event.get('message') or ''}")
+    return JSONResponse({"ok": True})
+
+
+def main() -> None:
+    global secret, fail_rate
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for an integration receiving job callbacks."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--secret", default=None, help="Verify signatures with this secret")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of 503 responses")
+    args = parser.parse_args()
+    secret = args.secret
+    fail_rate = args.fail_rate
+
+    import uvicorn
+
+    print(f"Webhook receiver: callback_url=http://{args.host}:{args.port}/hook")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,61 @@
+import { createHash } from 'node:crypto';
+import { readdirSync, readFileSync, writeFileSync } from 'node:fs';
+import { join, relative, sep } from 'node:path';
+import { fileURLToPath } from 'node:url';
 import { defineConfig } from 'vite';
 import vue from '@vitejs/plugin-vue';
 
+const srcDir = fileURLToPath(new URL('./src', import.meta.url));
+const outDir = fileURLToPath(new URL('../backend/webui', import.meta.url));
+
+// Hash of src/, matched by _webui_source_hash in backend/app/main.py, so the
+// backend can warn when the committed bundle is older than the sources.
+const sourceHash = () => {
+  const files = [];
+  const walk = (dir) => {
+    for (const entry of readdirSync(dir, { withFileTypes: true })) {
+      const path = join(dir, entry.name);
+      if (entry.isDirectory()) {
+        walk(path);
+      } else if (entry.isFile()) {
+        files.push(relative(srcDir, path).split(sep).join('/'));
+      }
+    }
+  };
+  walk(srcDir);
+  const hash = createHash('sha256');
+  for (const name of files.sort()) {
+    hash.update(`${name}\0`);
+    hash.update(readFileSync(join(srcDir, name)));
+    hash.update('\0');
+  }
+  return hash.digest('hex');
+};
+
+const buildStamp = () => ({
+  name: 'tiny-craft-build-stamp',
+  closeBundle() {
+    writeFileSync(
+      join(outDir, 'build.json'),
+      `${JSON.stringify({ source_sha256: sourceHash() })}\n`,
+    );
+  },
+});
+
 export default defineConfig({
   base: '/webui/',
-  plugins: [vue()],
+  plugins: [vue(), buildStamp()],
   build: {
-    outDir: '../backend/webui',
+    outDir,
     emptyOutDir: true,
   },
   server: {
     port: 5173,
     proxy: {
-      '/api': 'http://127.0.0.1:8000',
+      '/api': {
+        target: 'http://127.0.0.1:8000',
+        ws: true,
+      },
     },
   },
 });